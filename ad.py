@@ -0,0 +1,82 @@
+import re
+
+_PRICE_RE = re.compile(r'(\d[\d.]*)(?:,(\d{1,2}))?')
+_DISTANCE_RE = re.compile(r'(\d+)\s*km')
+_POSTCODE_RE = re.compile(r'\b(\d{5})\b')
+_FOLD = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+
+def parse_price(price_str):
+    """'1.200 € VB' -> 1200.0, None if there is no number."""
+    match = _PRICE_RE.search(price_str or "")
+    if not match:
+        return None
+    value = float(match.group(1).replace('.', ''))
+    if match.group(2):
+        value += int(match.group(2)) / 10 ** len(match.group(2))
+    return value
+
+
+def extract_distance(location_str):
+    """Extract distance in km from location string"""
+    match = _DISTANCE_RE.search(location_str or "")
+    return int(match.group(1)) if match else None
+
+
+def extract_postcode(location_str):
+    match = _POSTCODE_RE.search(location_str or "")
+    return match.group(1) if match else None
+
+
+def normalize(text):
+    """Form used for all keyword matching: lower case, umlauts and ß folded."""
+    return text.lower().translate(_FOLD)
+
+
+class Ad:
+    """
+    One search result.
+
+    Holds the strings scraped from the result page plus the values derived
+    from them, which are computed once here instead of in every consumer.
+    Item access (ad['title']) still works for code written against the old
+    dict records.
+    """
+
+    FIELDS = ('id', 'title', 'price', 'link', 'location', 'image')
+
+    __slots__ = FIELDS + ('price_value', 'negotiable', 'distance_km', 'postcode', 'title_norm')
+
+    def __init__(self, id, title, price, link, location, image):
+        self.id = id
+        self.title = title
+        self.price = price
+        self.link = link
+        self.location = location
+        self.image = image
+        self.price_value = parse_price(price)
+        self.negotiable = 'VB' in price
+        self.distance_km = extract_distance(location)
+        self.postcode = extract_postcode(location)
+        self.title_norm = normalize(title)
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __eq__(self, other):
+        if not isinstance(other, Ad):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+
+    def __repr__(self):
+        return f"Ad({self.as_dict()!r})"
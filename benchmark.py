@@ -0,0 +1,218 @@
+"""
+Offline micro-benchmarks for the scrape / parse / match hot path.
+
+Runs against the recorded debug_last_response.html and synthetic pages from
+fixtures.py, no network access needed.
+
+    python benchmark.py                       # run and print
+    python benchmark.py --save                # store results as the new baseline
+    python benchmark.py --compare             # flag regressions against the baseline
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fixtures
+import manager
+import stream_parser
+from ad import normalize
+from matcher import KeywordMatcher, rule_for
+from scraper import KleinanzeigenScraper
+
+BASELINE_FILE = "bench_baseline.json"
+PAGE_SIZES = (25, 100, 1000)
+SEEN_SIZES = (10000, 100000)
+
+
+def measure(func, min_time=0.5, min_rounds=5, max_rounds=1000):
+    """Calls func repeatedly and returns latency percentiles, throughput and peak allocation."""
+    func()  # warm up
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < max_rounds:
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+        if len(timings) >= min_rounds and time.perf_counter() - start >= min_time:
+            break
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings.sort()
+
+    def pct(p):
+        return timings[min(len(timings) - 1, int(round(p / 100 * (len(timings) - 1))))]
+
+    return {
+        'rounds': len(timings),
+        'ops_per_sec': len(timings) / sum(timings),
+        'p50_ms': pct(50) * 1000,
+        'p95_ms': pct(95) * 1000,
+        'p99_ms': pct(99) * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'peak_kb': peak / 1024,
+    }
+
+
+def bench_parsing(scraper):
+    with open(fixtures.RECORDED_PAGE, encoding="utf-8") as f:
+        pages = {'recorded': f.read()}
+    for n in PAGE_SIZES:
+        pages[f'{n}_ads'] = fixtures.make_results_page(n, "desktop", seed=n)
+    pages['100_ads_mobile'] = fixtures.make_results_page(100, "mobile", seed=100)
+
+    for name, html in pages.items():
+        yield f'parse_results[bs4,{name}]', lambda html=html: scraper.parse_results_soup(html)
+        yield f'parse_results[stream,{name}]', lambda html=html: list(
+            stream_parser.iter_results(html, scraper.base_url))
+
+    detail = fixtures.make_detail_page(3250000001, paragraphs=20)
+    yield 'parse_details[bs4]', lambda: scraper.parse_details_soup(detail)
+    yield 'parse_details[stream]', lambda: stream_parser.extract_description(detail)
+
+
+def bench_matching(scraper):
+    ads = scraper.parse_results_soup(fixtures.make_results_page(1000, "desktop", seed=1))
+    desc = scraper.parse_details_soup(fixtures.make_detail_page(3250000001))
+    searches = [
+        ("iphone", []),
+        ("fahrrad", ["damen", "28 zoll"]),
+        ("sofa", ["leder", "ecksofa", "sessel"]),
+        ("nicht vorhanden", []),
+    ]
+    # Pad up to a realistic number of saved searches
+    words = sorted({word for title in fixtures.TITLES for word in title.lower().split() if word.isalpha()})
+    for i in range(150 - len(searches)):
+        searches.append((words[i % len(words)] + ("" if i < len(words) else f" {i}"), [words[(i * 7) % len(words)]]))
+
+    def match_naive():
+        # What the monitor loop used to do: every search on its own, lower() on every check
+        for query, filters in searches:
+            for ad in ads:
+                title = ad.title
+                if query.lower() not in title.lower() and query.lower() not in desc.lower():
+                    continue
+                if filters and not any(k.lower() in title.lower() for k in filters):
+                    any(k.lower() in desc.lower() for k in filters)
+
+    rules = [rule_for({'query': q, 'filter_keywords': f}) for q, f in searches]
+    compiled = KeywordMatcher(rules)
+
+    def match_compiled():
+        desc_hits = compiled.scan(normalize(desc))
+        for ad in ads:
+            title_hits = compiled.scan(ad.title_norm)
+            for rule in rules:
+                if compiled.decide(rule, title_hits) is None:
+                    compiled.decide(rule, title_hits, desc_hits)
+
+    yield 'match.compile[150_searches]', lambda: KeywordMatcher(rules)
+    yield f'match[naive,{len(searches)}_searches,{len(ads)}_ads]', match_naive
+    yield f'match[compiled,{len(searches)}_searches,{len(ads)}_ads]', match_compiled
+
+
+def bench_persistence(tmpdir):
+    manager.CONFIG_FILE = os.path.join(tmpdir, "config.json")
+    manager.DETAIL_CACHE_FILE = os.path.join(tmpdir, "details.db")
+    manager.SEEN_ADS_FILE = os.path.join(tmpdir, "seen_ads.db")
+    mgr = manager.SearchManager()
+    mgr.searches = [{'query': f'suche {i}', 'location': 'Berlin', 'radius': '10', 'category_id': "0",
+                     'filter_keywords': [], 'active': True, 'notifications': True, 'first_run': False}
+                    for i in range(150)]
+    # Caller side cost, the disk write happens on the writer thread
+    yield 'save_config[150_searches]', mgr.save_config
+
+    counter = iter(range(10 ** 9))
+
+    def write_config():
+        mgr.writer.update('bench', next(counter))
+        mgr.writer.flush()
+    yield 'config_writer.flush[150_searches]', write_config
+
+    for n in SEEN_SIZES:
+        mgr.seen_ads.update(str(3000000000 + i) for i in range(n))
+        listed = [str(3000000000 + i) for i in range(0, n, n // 25)]
+        yield f'seen_ads.lookup[{n}_seen,25_listed]', lambda listed=listed: [ad in mgr.seen_ads for ad in listed]
+
+    next_id = iter(range(4000000000, 5000000000))
+    yield 'seen_ads.add[new_id]', lambda: mgr.seen_ads.add(next(next_id))
+
+
+def run(selected=None):
+    scraper = KleinanzeigenScraper()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cases = [bench_parsing(scraper), bench_matching(scraper), bench_persistence(tmpdir)]
+        for group in cases:
+            for name, func in group:
+                if selected and not any(s in name for s in selected):
+                    continue
+                results[name] = measure(func)
+                r = results[name]
+                print(f"{name:<42} {r['ops_per_sec']:>10.1f} ops/s  p50 {r['p50_ms']:>9.3f} ms  "
+                      f"p95 {r['p95_ms']:>9.3f} ms  p99 {r['p99_ms']:>9.3f} ms  peak {r['peak_kb']:>9.1f} KB")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns a list of regressions, a case regresses if p50 or peak allocation grew by more than threshold."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ('p50_ms', 'peak_kb'):
+            if base[key] > 0 and r[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {base[key]:.3f} -> {r[key]:.3f} "
+                                   f"(+{(r[key] / base[key] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='selected', action='append', help="only run cases containing this string")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help="store results as baseline")
+    parser.add_argument('--compare', action='store_true', help="compare against the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    results = run(args.selected)
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}, run with --save first.")
+            return 2
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nNo regressions.")
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
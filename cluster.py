@@ -0,0 +1,390 @@
+"""
+Coordinator/worker mode for running searches on several processes or hosts.
+
+The coordinator owns config.json, the seen-ads database and the result
+store. Workers register with a heartbeat and get their share of the fetch
+groups from a consistent-hash ring over the live workers, so a worker that
+joins or stops answering only moves the groups next to it on the ring.
+A new ad is only reported by the worker whose /cluster/claim for it
+succeeds, the claim is an INSERT OR IGNORE in the coordinator's SQLite
+store, so no ad is ever notified twice.
+
+    python cluster.py coordinator --port 8800
+    python cluster.py worker --coordinator http://host:8800 --id worker-1
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import signal
+import threading
+import time
+import urllib.request
+
+import manager
+from ad import Ad
+from daemon import ControlHandler, ControlServer, setup_logging
+from planner import plan_cycle, search_key
+from matcher import rule_for
+from result_store import ResultStore
+from seen_store import ad_key
+
+logger = logging.getLogger("cluster")
+
+# Fields a worker updates while scanning, reported back with every heartbeat
+# Shared by all searches of a fetch group
+GROUP_FIELDS = ('watermark', 'rate')
+# Belong to one search definition, other filters on the same result list have their own
+DEFINITION_FIELDS = ('first_run', 'pending')
+STATE_FIELDS = GROUP_FIELDS + DEFINITION_FIELDS
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def group_id(key):
+    return '|'.join(str(part) for part in key)
+
+
+class HashRing:
+    """Consistent hashing with virtual nodes."""
+
+    def __init__(self, nodes=(), replicas=64):
+        self.replicas = replicas
+        self._points = []  # sorted (hash, node)
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            bisect.insort(self._points, (_hash(f"{node}#{i}"), node))
+
+    def remove(self, node):
+        self._points = [point for point in self._points if point[1] != node]
+
+    @property
+    def nodes(self):
+        return {node for _, node in self._points}
+
+    def node_for(self, key):
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, (_hash(key),))
+        return self._points[i % len(self._points)][1]
+
+
+class Coordinator:
+    """Worker registry and the shared state behind the /cluster endpoints."""
+
+    def __init__(self, mgr, worker_timeout=15.0, replicas=64):
+        self.manager = mgr
+        self.worker_timeout = worker_timeout
+        self.ring = HashRing(replicas=replicas)
+        self.workers = {}  # worker id -> last heartbeat (monotonic)
+        self.version = 0   # bumped whenever the ring changes
+        self._lock = threading.Lock()
+
+    def heartbeat(self, worker_id, states=()):
+        """Registers the worker, applies its search state and returns its searches."""
+        with self._lock:
+            if worker_id not in self.workers:
+                self.ring.add(worker_id)
+                self.version += 1
+                logger.info(f"Worker {worker_id} joined, {len(self.workers) + 1} workers")
+            self.workers[worker_id] = time.monotonic()
+        self.apply_states(states)
+        return self.assignment(worker_id)
+
+    def leave(self, worker_id):
+        with self._lock:
+            if self.workers.pop(worker_id, None) is not None:
+                self.ring.remove(worker_id)
+                self.version += 1
+                logger.info(f"Worker {worker_id} left, {len(self.workers)} workers")
+
+    def expire(self):
+        """Drops workers without a heartbeat for worker_timeout seconds, their searches move on."""
+        cutoff = time.monotonic() - self.worker_timeout
+        for worker_id, seen in list(self.workers.items()):
+            if seen < cutoff:
+                logger.warning(f"Worker {worker_id} stopped answering")
+                self.leave(worker_id)
+
+    def assignment(self, worker_id):
+        active = [s for s in self.manager.snapshot_searches() if s.get('active', True)]
+        with self._lock:
+            return [search for group in plan_cycle(active)
+                    if self.ring.node_for(group_id(group.key)) == worker_id
+                    for search in group.searches]
+
+    def apply_states(self, states):
+        changed = False
+        with self.manager.searches_lock:
+            for state in states:
+                key = tuple(state['key'])
+                rule = (state['rule'][0], tuple(state['rule'][1])) if state.get('rule') else None
+                for search in self.manager.searches:
+                    if search_key(search) != key:
+                        continue
+                    fields = STATE_FIELDS if rule_for(search) == rule else GROUP_FIELDS
+                    for field in fields:
+                        if field in state and state[field] is not None and search.get(field) != state[field]:
+                            # A search that has had its first run stays done
+                            if field == 'first_run' and state[field]:
+                                continue
+                            search[field] = state[field]
+                            changed = True
+        if changed:
+            self.manager.save_config()
+
+    def claim(self, ids):
+        """Marks ids as seen, returns those that were new. First caller wins."""
+        return [ad_id for ad_id in ids if self.manager.seen_ads.add(ad_id)]
+
+    def touch(self, ids):
+        self.manager.seen_ads.touch(ids)
+
+    def add_results(self, results):
+        for item in results:
+            ad = Ad(*[item['ad'].get(field) for field in Ad.FIELDS])
+            key = tuple(item['search_key']) if item.get('search_key') else None
+            self.manager.found_ads.add(ad, key)
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            workers = {worker_id: round(now - seen, 1) for worker_id, seen in self.workers.items()}
+        active = [s for s in self.manager.searches if s.get('active', True)]
+        groups = {}
+        with self._lock:
+            for group in plan_cycle(active):
+                node = self.ring.node_for(group_id(group.key))
+                groups[node] = groups.get(node, 0) + 1
+        return {'workers': workers, 'groups': groups, 'version': self.version}
+
+
+class CoordinatorHandler(ControlHandler):
+
+    def do_GET(self):
+        if self._parts() == ['cluster']:
+            self._send(200, self.server.coordinator.status())
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        parts = self._parts()
+        if len(parts) != 2 or parts[0] != 'cluster':
+            super().do_POST()
+            return
+        data = self._read_json()
+        if not isinstance(data, dict):
+            self._send(400, {'error': "JSON object expected"})
+            return
+        coordinator = self.server.coordinator
+        action = parts[1]
+        if action == 'heartbeat' and data.get('worker'):
+            searches = coordinator.heartbeat(data['worker'], data.get('states', ()))
+            self._send(200, {'searches': searches, 'version': coordinator.version})
+        elif action == 'leave' and data.get('worker'):
+            coordinator.leave(data['worker'])
+            self._send(200, {})
+        elif action == 'claim':
+            self._send(200, {'claimed': coordinator.claim(data.get('ids', ()))})
+        elif action == 'touch':
+            coordinator.touch(data.get('ids', ()))
+            self._send(200, {})
+        elif action == 'results':
+            coordinator.add_results(data.get('results', ()))
+            self._send(200, {})
+        else:
+            self._send(404, {'error': "not found"})
+
+
+class CoordinatorServer(ControlServer):
+
+    def __init__(self, coordinator, host="127.0.0.1", port=8800):
+        super().__init__(coordinator.manager, host, port, CoordinatorHandler)
+        self.coordinator = coordinator
+
+
+def _post(url, payload, timeout=10):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+class RemoteSeenStore:
+    """SeenAdsStore interface backed by the coordinator, add() is the cluster wide claim."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.max_age_days = 30  # Eviction runs on the coordinator
+        self._claimed = set()
+
+    def __contains__(self, ad_id):
+        return ad_key(ad_id) in self._claimed
+
+    def __len__(self):
+        return len(self._claimed)
+
+    def add(self, ad_id):
+        key = ad_key(ad_id)
+        if key in self._claimed:
+            return False
+        claimed = _post(self.url + "/cluster/claim", {'ids': [str(ad_id)]})['claimed']
+        self._claimed.add(key)
+        return bool(claimed)
+
+    def update(self, ad_ids):
+        ad_ids = [str(ad_id) for ad_id in ad_ids]
+        if ad_ids:
+            _post(self.url + "/cluster/claim", {'ids': ad_ids})
+            self._claimed.update(map(ad_key, ad_ids))
+
+    def touch(self, ad_ids):
+        ad_ids = [str(ad_id) for ad_id in ad_ids]
+        if ad_ids:
+            _post(self.url + "/cluster/touch", {'ids': ad_ids})
+
+    def evict(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class RemoteResultStore(ResultStore):
+    """Local ResultStore that also forwards every new match to the coordinator."""
+
+    def __init__(self, url, max_size=10000):
+        super().__init__(max_size)
+        self.url = url.rstrip('/')
+
+    def add(self, ad, search_key=None):
+        added = super().add(ad, search_key)
+        if added:
+            _post(self.url + "/cluster/results",
+                  {'results': [{'ad': ad.as_dict(), 'search_key': list(search_key) if search_key else None}]})
+        return added
+
+
+def _definition(search):
+    return search_key(search), rule_for(search)
+
+
+class ClusterWorker:
+    """Runs a SearchManager on the searches the coordinator assigns to this worker."""
+
+    def __init__(self, url, worker_id, mgr=None, heartbeat=5.0):
+        self.url = url.rstrip('/')
+        self.worker_id = worker_id
+        self.heartbeat = heartbeat
+        if mgr is None:
+            mgr = manager.SearchManager(seen_ads=RemoteSeenStore(url))
+            mgr.found_ads = RemoteResultStore(url, mgr.max_results)
+        self.manager = mgr
+        self.version = None
+
+    def states(self):
+        states = {}
+        for search in self.manager.snapshot_searches():
+            key, rule = _definition(search)
+            state = states.setdefault((key, rule), {'key': list(key), 'rule': [rule[0], list(rule[1])]})
+            for field in STATE_FIELDS:
+                if field in search:
+                    state[field] = search[field]
+        return list(states.values())
+
+    def sync(self):
+        """One heartbeat: reports state, takes over the current assignment."""
+        answer = _post(self.url + "/cluster/heartbeat", {'worker': self.worker_id, 'states': self.states()})
+        with self.manager.searches_lock:
+            local = {_definition(search): search for search in self.manager.searches}
+            searches = []
+            for search in answer['searches']:
+                current = local.get(_definition(search))
+                if current is not None:
+                    # Keep what this worker learned since the last heartbeat
+                    for field, value in search.items():
+                        if field not in STATE_FIELDS:
+                            current[field] = value
+                    search = current
+                searches.append(search)
+            self.manager.searches = searches
+        if answer['version'] != self.version:
+            logger.info(f"Assignment changed, {len(searches)} searches on this worker")
+            self.version = answer['version']
+        return searches
+
+    def leave(self):
+        try:
+            _post(self.url + "/cluster/leave", {'worker': self.worker_id}, timeout=5)
+        except OSError as e:
+            logger.warning(f"Could not sign off: {e}")
+
+    def run(self, stop):
+        started = False
+        while not stop.is_set():
+            try:
+                self.sync()
+                if not started:
+                    # Only scan once the coordinator said what
+                    self.manager.start_monitoring()
+                    started = True
+            except OSError as e:
+                logger.warning(f"Coordinator not reachable: {e}")
+            stop.wait(self.heartbeat)
+        self.manager.stop_monitoring()
+        self.manager.notifier.close()
+        self.leave()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kleinanzeigen Bot im Cluster-Betrieb")
+    parser.add_argument("--log-file")
+    parser.add_argument("--log-level", default="INFO")
+    sub = parser.add_subparsers(dest="role", required=True)
+    coord = sub.add_parser("coordinator")
+    coord.add_argument("--config", default=manager.CONFIG_FILE)
+    coord.add_argument("--host", default="127.0.0.1")
+    coord.add_argument("--port", type=int, default=8800)
+    coord.add_argument("--worker-timeout", type=float, default=15.0)
+    worker = sub.add_parser("worker")
+    worker.add_argument("--coordinator", required=True, help="URL of the coordinator")
+    worker.add_argument("--id", required=True, help="Unique name of this worker")
+    worker.add_argument("--config", help="Worker settings, default worker-<id>.json")
+    worker.add_argument("--heartbeat", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    setup_logging(args.log_file, args.log_level.upper())
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    if args.role == "coordinator":
+        manager.CONFIG_FILE = args.config
+        coordinator = Coordinator(manager.SearchManager(), args.worker_timeout)
+        server = CoordinatorServer(coordinator, args.host, args.port)
+        server.start()
+        logger.info(f"Coordinator on http://{args.host}:{server.server_address[1]}/")
+        last_evict = time.monotonic()
+        while not stop.wait(1):
+            coordinator.expire()
+            if time.monotonic() - last_evict > 3600:
+                coordinator.manager.seen_ads.evict()
+                last_evict = time.monotonic()
+        server.shutdown()
+        server.server_close()
+        coordinator.manager.notifier.close()
+        coordinator.manager.writer.close()
+    else:
+        # Searches come from the coordinator, the local file only keeps the settings
+        manager.CONFIG_FILE = args.config or f"worker-{args.id}.json"
+        ClusterWorker(args.coordinator, args.id, heartbeat=args.heartbeat).run(stop)
+
+
+if __name__ == "__main__":
+    main()
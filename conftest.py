@@ -0,0 +1,43 @@
+import pytest
+
+import manager
+from standin_server import StandinServer, World
+
+
+class Clock:
+    """Time of the stand-in world, it only moves when a test moves it."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def mgr(tmp_path, monkeypatch):
+    """A SearchManager whose config, databases and logs live in tmp_path."""
+    monkeypatch.setattr(manager, "CONFIG_FILE", str(tmp_path / "config.json"))
+    monkeypatch.setattr(manager, "DETAIL_CACHE_FILE", str(tmp_path / "details.db"))
+    monkeypatch.setattr(manager, "SEEN_ADS_FILE", str(tmp_path / "seen_ads.db"))
+    # Relative paths like the request log end up there too
+    monkeypatch.chdir(tmp_path)
+    search_manager = manager.SearchManager()
+    yield search_manager
+    search_manager.notifier.close()
+    search_manager.writer.close()
+
+
+@pytest.fixture
+def standin(mgr):
+    """
+    A stand-in server mgr searches on, without request delays. One new ad
+    per search appears for every 60 s the test adds to standin.world.clock.now.
+    """
+    server = StandinServer(World(churn=1.0, clock=Clock()))
+    server.start()
+    mgr.scraper.base_url = server.url
+    mgr.scraper.governor.set_delay(0, 0)
+    yield server
+    server.shutdown()
+    server.server_close()
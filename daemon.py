@@ -0,0 +1,221 @@
+"""
+Headless mode: runs the SearchManager as a long-lived service without Tk.
+
+    python daemon.py --log-file bot.log --port 8765
+
+SIGTERM/SIGINT stop gracefully (pending config writes are flushed),
+SIGHUP reloads config.json. A small HTTP API on localhost controls the
+searches:
+
+    GET    /status                   state, scheduler and transfer stats
+    GET    /metrics                  timing histograms and request counters,
+                                     Prometheus text format, ?format=json for JSON
+    GET    /searches                 all searches with their index
+    POST   /searches                 add, JSON body {"query", "location", "radius", ...}
+    DELETE /searches/<index>         remove
+    POST   /searches/<index>/toggle  toggle notifications
+"""
+import argparse
+import json
+import logging
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import manager
+from manager import SearchManager
+
+logger = logging.getLogger("daemon")
+
+
+class ControlHandler(BaseHTTPRequestHandler):
+    server_version = "KleinanzeigenBot"
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def _send(self, status, payload, content_type="application/json; charset=utf-8"):
+        text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _parts(self):
+        return [part for part in self.path.split('?', 1)[0].split('/') if part]
+
+    @staticmethod
+    def _index(value):
+        """The index in the path, whether a search has it is checked under the manager's lock."""
+        try:
+            return int(value)
+        except ValueError:
+            return None
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        parts = self._parts()
+        if parts == ['searches']:
+            self._send(200, [dict(search, index=i) for i, search in enumerate(self.manager.snapshot_searches())])
+        elif parts == ['status']:
+            self._send(200, status(self.manager))
+        elif parts == ['metrics']:
+            metrics = self.manager.metrics
+            if 'format=json' in self.path.partition('?')[2]:
+                self._send(200, metrics.snapshot())
+            else:
+                self._send(200, metrics.to_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send(404, {'error': "not found"})
+
+    def do_POST(self):
+        parts = self._parts()
+        if parts == ['searches']:
+            data = self._read_json()
+            error = search_error(data)
+            if error:
+                self._send(400, {'error': error})
+                return
+            index = self.manager.add_search(
+                data['query'],
+                data.get('location', ""),
+                data.get('radius', 0),
+                str(data.get('category_id', "0")),
+                data.get('filter_keywords') or [],
+                data.get('notifications', True),
+            )
+            logger.info(f"Added search '{data['query']}'")
+            self._send(201, {'index': index})
+        elif len(parts) == 3 and parts[0] == 'searches' and parts[2] == 'toggle':
+            index = self._index(parts[1])
+            enabled = self.manager.toggle_notifications(index) if index is not None else None
+            if enabled is None:
+                self._send(404, {'error': "no such search"})
+                return
+            self._send(200, {'notifications': enabled})
+        else:
+            self._send(404, {'error': "not found"})
+
+    def do_DELETE(self):
+        parts = self._parts()
+        index = self._index(parts[1]) if len(parts) == 2 and parts[0] == 'searches' else None
+        search = self.manager.remove_search(index) if index is not None else None
+        if search is None:
+            self._send(404, {'error': "no such search"})
+            return
+        logger.info(f"Removed search '{search['query']}'")
+        self._send(200, {'removed': search['query']})
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def search_error(data):
+    """Why a POST /searches body can not become a search, None if it can."""
+    if not isinstance(data, dict) or not isinstance(data.get('query'), str) or not data['query'].strip():
+        return "JSON object with at least 'query' expected"
+    if not isinstance(data.get('location', ""), str):
+        return "'location' must be a string"
+    for field in ('radius', 'category_id'):
+        value = data.get(field, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            return f"'{field}' must be a number or a string"
+    keywords = data.get('filter_keywords')
+    if keywords is not None and (not isinstance(keywords, list)
+                                 or not all(isinstance(keyword, str) for keyword in keywords)):
+        return "'filter_keywords' must be a list of strings"
+    if not isinstance(data.get('notifications', True), bool):
+        return "'notifications' must be true or false"
+    return None
+
+
+def status(mgr):
+    """Snapshot of the manager for the control API."""
+    return {
+        'running': mgr.running,
+        'searches': len(mgr.searches),
+        'found_ads': len(mgr.found_ads),
+        'intervals': {' / '.join(str(part) for part in key): {'interval': interval, 'new_per_hour': rate}
+                      for key, (interval, rate) in mgr.scheduler.intervals().items()},
+        'governor': mgr.scraper.governor.stats(),
+        'transfer': mgr.scraper.transfer_stats.snapshot(),
+        'fingerprints': dict(mgr.fingerprint_stats),
+        'last_cycle': mgr.metrics.cycle_summary(),
+    }
+
+
+class ControlServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, mgr, host="127.0.0.1", port=8765, handler=ControlHandler):
+        super().__init__((host, port), handler)
+        self.manager = mgr
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def setup_logging(log_file=None, level="INFO"):
+    handler = logging.FileHandler(log_file, encoding='utf-8') if log_file else logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kleinanzeigen Bot ohne GUI")
+    parser.add_argument("--config", default=manager.CONFIG_FILE, help="Path of config.json")
+    parser.add_argument("--log-file", help="Log to this file instead of stdout")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--host", default="127.0.0.1", help="Address of the control API")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the control API, 0 disables it")
+    args = parser.parse_args(argv)
+
+    setup_logging(args.log_file, args.log_level.upper())
+    manager.CONFIG_FILE = args.config
+    mgr = SearchManager()
+
+    # The handlers only set flags, the work happens in the loop below
+    stop = threading.Event()
+    reload = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload.set())
+
+    server = None
+    if args.port:
+        server = ControlServer(mgr, args.host, args.port)
+        server.start()
+        logger.info(f"Control API on http://{args.host}:{server.server_address[1]}/")
+
+    mgr.start_monitoring()
+    while not stop.wait(0.5):
+        if reload.is_set():
+            reload.clear()
+            mgr.reload_config()
+
+    logger.info("Shutting down")
+    if server:
+        server.shutdown()
+        server.server_close()
+    mgr.stop_monitoring()
+    mgr.notifier.close()
+    mgr.writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class DetailCache:
+    """
+    Persistent store of ad descriptions keyed by ad id.
+
+    Descriptions are zlib compressed in a small SQLite database. Entries older
+    than ttl seconds count as missing so they get fetched again, and the oldest
+    entries are evicted once the stored data exceeds max_bytes.
+    """
+
+    EVICT_EVERY = 100  # puts between two size checks
+
+    def __init__(self, path="details.db", ttl=2 * 24 * 3600, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS details ("
+            " ad_id INTEGER PRIMARY KEY,"
+            " fetched_at REAL NOT NULL,"
+            " data BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS details_age ON details (fetched_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(ad_id):
+        try:
+            return int(ad_id)
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, ad_id):
+        """Returns the cached description or None if missing or expired."""
+        key = self._key(ad_id)
+        if key is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at, data FROM details WHERE ad_id = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return zlib.decompress(row[1]).decode("utf-8")
+
+    def put(self, ad_id, description):
+        key = self._key(ad_id)
+        if key is None:
+            return
+        data = zlib.compress(description.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO details (ad_id, fetched_at, data) VALUES (?, ?, ?)",
+                (key, time.time(), data),
+            )
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % self.EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM details").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop the oldest entries until we are back under the limit
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for ad_id, size in self._conn.execute(
+            "SELECT ad_id, LENGTH(data) FROM details ORDER BY fetched_at"
+        ):
+            victims.append((ad_id,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM details WHERE ad_id = ?", victims)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,124 @@
+"""
+Streamed response bodies.
+
+A Download hands out the decoded body of a streamed response chunk by chunk.
+The caller stops reading as soon as it has what it needs, finish() then
+either drains a small remainder (so the connection goes back to the pool)
+or closes the connection, and records how many bytes went over the wire.
+"""
+import codecs
+import threading
+import time
+
+READ_SIZE = 8 * 1024
+# Reading up to this many more bytes is cheaper than a new TLS handshake
+DRAIN_LIMIT = 32 * 1024
+
+
+class TransferStats:
+    """Bytes transferred and saved by early termination, per request kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds = {}
+
+    def record(self, kind, transferred, saved=None, aborted=False):
+        with self._lock:
+            stats = self._kinds.setdefault(kind, {'requests': 0, 'bytes': 0, 'saved': 0, 'aborted': 0})
+            stats['requests'] += 1
+            stats['bytes'] += transferred
+            stats['saved'] += saved or 0
+            stats['aborted'] += aborted
+
+    def snapshot(self):
+        with self._lock:
+            return {kind: dict(stats) for kind, stats in self._kinds.items()}
+
+    def summary(self):
+        parts = []
+        for kind, stats in sorted(self.snapshot().items()):
+            part = f"{kind}: {stats['requests']} requests, {stats['bytes'] / 1024:.0f} KB"
+            if stats['aborted']:
+                part += f" ({stats['aborted']} stopped early"
+                part += f", {stats['saved'] / 1024:.0f} KB saved)" if stats['saved'] else ")"
+            parts.append(part)
+        return "; ".join(parts)
+
+
+class Download:
+    """Decoded text chunks of a response opened with stream=True."""
+
+    def __init__(self, response, kind, stats=None, metrics=None, url=None, started=None, cache=None):
+        self.response = response
+        self.kind = kind
+        self.stats = stats
+        # Request metrics, wall time counts from started (when the request was sent)
+        self.metrics = metrics
+        self.url = url
+        self.started = time.perf_counter() if started is None else started
+        self.cache = cache
+        self.complete = False
+        self._finished = False
+
+    def chunks(self):
+        decoder = codecs.getincrementaldecoder(self.response.encoding or 'utf-8')(errors='replace')
+        # iter_content undoes the gzip/deflate transfer encoding
+        for data in self.response.iter_content(READ_SIZE):
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+        self.complete = True
+
+    def text(self):
+        """The complete body."""
+        return ''.join(self.chunks())
+
+    def _wire_bytes(self):
+        raw = self.response.raw
+        return raw.tell() if hasattr(raw, 'tell') else 0
+
+    def finish(self):
+        """Releases the connection and records the transfer, call once reading is done."""
+        if self._finished:
+            return
+        self._finished = True
+        raw = self.response.raw
+        aborted = False
+        if not self.complete:
+            try:
+                # A small rest is drained so the connection can be reused
+                start = self._wire_bytes()
+                while self._wire_bytes() - start <= DRAIN_LIMIT:
+                    if not raw.read(READ_SIZE):
+                        self.complete = True
+                        break
+                else:
+                    aborted = True
+            except Exception:
+                aborted = True
+
+        transferred = self._wire_bytes()
+        saved = None
+        if aborted:
+            length = self.response.headers.get('Content-Length')
+            if length and length.isdigit():
+                saved = max(0, int(length) - transferred)
+        if self.complete:
+            raw.release_conn()
+        else:
+            # Closing an unfinished body drops the connection instead of reading the rest
+            self.response.close()
+        if self.stats is not None:
+            self.stats.record(self.kind, transferred, saved, aborted)
+        if self.metrics is not None:
+            self.metrics.request(self.kind, self.url, self.response.status_code,
+                                 time.perf_counter() - self.started, transferred, self.cache)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
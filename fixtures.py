@@ -0,0 +1,165 @@
+"""
+Synthetic Kleinanzeigen pages for offline tests and benchmarks.
+
+The markup follows the structure parse_results expects for both the desktop
+(srchrslt-adtable) and the mobile (srp-results) layout, including top ads,
+placeholder items, entities and nested tags.
+"""
+import random
+
+RECORDED_PAGE = "debug_last_response.html"
+
+TITLES = [
+    "iPhone 13 128GB Blau", "Fahrrad 28 Zoll Damen", "Sofa &amp; Sessel", "PlayStation 5 Disc",
+    "Kinderwagen Bugaboo", "Lego Technic 42115", "Rasenmäher Benzin", "Schreibtisch weiß",
+    "MacBook Air M1", "Waschmaschine Bosch", "Winterjacke Größe M", "Gitarre Yamaha",
+]
+PLACES = [
+    ("10115", "Mitte"), ("10961", "Kreuzberg"), ("12043", "Neukölln"), ("13353", "Wedding"),
+    ("14467", "Potsdam"), ("20095", "Hamburg"), ("80331", "München"), ("50667", "Köln"),
+]
+PRICES = ["150 €", "1.200 € VB", "VB", "45 €", "Zu verschenken", "980 €"]
+
+HEAD = """<!DOCTYPE html>
+<html lang="de">
+<head>
+    <meta charset="utf-8"/>
+    <title>Kleinanzeigen</title>
+    <script>window.dataLayer = [{"page": "<ul>srp</ul>"}];</script>
+    <style>.aditem { color: red; }</style>
+</head>
+<body>
+<header id="site-header"><a href="/">Kleinanzeigen</a></header>
+"""
+
+TAIL = """
+<footer id="site-footer">
+    <ul class="footer-links"><li><a href="/impressum">Impressum</a></li></ul>
+    <script>var footer = "</div>";</script>
+</footer>
+</body>
+</html>
+"""
+
+
+def _ad(rnd, ad_id):
+    title = rnd.choice(TITLES)
+    plz, town = rnd.choice(PLACES)
+    distance = rnd.randint(1, 150)
+    price = rnd.choice(PRICES)
+    slug = "/s-anzeige/%s/%d-%d-%d" % (title.lower().replace(" ", "-").replace("&amp;", "und"),
+                                       ad_id, rnd.randint(100, 300), rnd.randint(1000, 9999))
+    has_image = rnd.random() < 0.8
+    return {
+        'id': ad_id, 'title': title, 'plz': plz, 'town': town, 'distance': distance,
+        'price': price, 'slug': slug, 'image': has_image,
+    }
+
+
+def _desktop_item(ad):
+    image = ('<div class="imagebox srpimagebox"><img src="https://img.kleinanzeigen.de/api/v1/prod-ads/'
+             'images/%d?rule=$_2.JPG" alt="%s" loading="lazy"/></div>' % (ad['id'], ad['title'])
+             if ad['image'] else '<div class="imagebox srpimagebox is-nopic"></div>')
+    return """
+        <li class="ad-listitem fully-clickable-card">
+            <article class="aditem" data-adid="%(id)d" data-href="%(slug)s">
+                <div class="aditem-image">
+                    <a href="%(slug)s">%(image)s</a>
+                </div>
+                <div class="aditem-main">
+                    <div class="aditem-main--top">
+                        <div class="aditem-main--top--left">
+                            <i class="icon icon-small icon-pin-gray"></i> %(plz)s %(town)s
+                            (%(distance)d km)
+                        </div>
+                        <div class="aditem-main--top--right">
+                            <i class="icon icon-small icon-calendar-open"></i>
+                            Heute, 10:%(minute)02d
+                        </div>
+                    </div>
+                    <div class="aditem-main--middle">
+                        <h2 class="text-module-begin">
+                            <a class="ellipsis" href="%(slug)s">%(title)s</a>
+                        </h2>
+                        <p class="aditem-main--middle--description">Sehr guter Zustand,<br/>nur Abholung.</p>
+                        <div class="aditem-main--middle--price-shipping">
+                            <p class="aditem-main--middle--price-shipping--price">
+                                %(price)s</p>
+                        </div>
+                    </div>
+                </div>
+            </article>
+        </li>""" % dict(ad, image=image, minute=ad['id'] % 60)
+
+
+def _mobile_item(ad):
+    image = ('<img src="https://img.kleinanzeigen.de/api/v1/prod-ads/images/%d?rule=$_2.JPG" alt=""/>' % ad['id']
+             if ad['image'] else '')
+    if ad['id'] % 17 == 0:
+        # Title without link, parse_results falls back to data-href
+        title = '<strong class="adlist--item--boldtitle">%s</strong>' % ad['title']
+    else:
+        title = '<strong class="adlist--item--boldtitle"><a href="%s">%s</a></strong>' % (ad['slug'], ad['title'])
+    return """
+    <li class="adlist--item" data-adid="%(id)d" data-href="%(slug)s">
+        <div class="adlist--item--image">%(image)s</div>
+        <div class="adlist--item--body">
+            %(title_html)s
+            <div class="adlist--item--price">%(price)s</div>
+            <div class="adlist--item--info">
+                <div class="adlist--item--info--location">%(plz)s %(town)s<br> <span>%(distance)d km</span></div>
+            </div>
+        </div>
+    </li>""" % dict(ad, image=image, title_html=title)
+
+
+def make_results_page(count, layout="desktop", seed=0, start_id=3250000000):
+    """Returns a results page with count ads, newest (highest id) first."""
+    rnd = random.Random(seed)
+    return _render_results([_ad(rnd, start_id + count - i) for i in range(count)], layout)
+
+
+def results_page(ad_ids, layout="desktop", seed=0):
+    """Returns a results page with the given ads in that order, an ad looks the same on every page."""
+    return _render_results([_ad(random.Random(seed + ad_id), ad_id) for ad_id in ad_ids], layout)
+
+
+def _render_results(ads, layout):
+    parts = [HEAD, '<div id="srchrslt-content">\n']
+    if layout == "desktop":
+        parts.append('<ul id="srchrslt-adtable" class="itemlist ad-list it3">')
+        parts.append("""
+        <li class="ad-listitem badge-topad is-topad">
+            <article class="aditem" data-adid="1">
+                <a class="ellipsis" href="/s-anzeige/topad/1">Top Anzeige</a>
+            </article>
+        </li>""")
+        for i, ad in enumerate(ads):
+            parts.append(_desktop_item(ad))
+            if i == 4:
+                parts.append('\n        <li class="ad-listitem"><div id="liberty-banner"></div></li>')
+    else:
+        parts.append('<ul id="srp-results" class="adlist">')
+        parts.append('\n    <li class="adlist--item-pla j-liberty-wrapper"><div></div></li>')
+        for ad in ads:
+            parts.append(_mobile_item(ad))
+    parts.append('\n</ul>\n</div>\n')
+    parts.append('<ul class="pagination"><li><a href="?pageNum=2">2</a></li></ul>')
+    parts.append(TAIL)
+    return ''.join(parts)
+
+
+def make_detail_page(ad_id, seed=0, paragraphs=4):
+    """Returns an ad detail page with a multi-line description."""
+    rnd = random.Random(seed + ad_id)
+    lines = []
+    for _ in range(paragraphs):
+        words = [rnd.choice(TITLES).split()[0] for _ in range(rnd.randint(8, 30))]
+        lines.append(' '.join(words) + ' &amp; Zubehör.')
+    return (HEAD
+            + '<article id="viewad-main"><h1 id="viewad-title">%s</h1>\n' % rnd.choice(TITLES)
+            + '<div id="viewad-description">\n    <p id="viewad-description-text" class="text-force-linebreak">'
+            '</p>\n    <div id="viewad-description-text" class="text-force-linebreak">\n        '
+            + '<br/>\n        '.join(lines)
+            + '\n    </div>\n</div>\n<div id="viewad-details"><ul><li>Zustand: Gut</li></ul></div>\n</article>'
+            + TAIL)
@@ -0,0 +1,215 @@
+import threading
+import time
+import logging
+import random
+import urllib.parse
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Status codes that mean "too fast" or "you are blocked"
+BLOCK_STATUS = frozenset([403, 429])
+
+CLOSED = "ok"
+OPEN = "paused"
+HALF_OPEN = "probing"
+
+
+class ScrapeError(Exception):
+    """A request failed, as opposed to a search without results."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class BlockedError(ScrapeError):
+    """The host rate limits or blocks us, or the circuit breaker paused it."""
+
+
+class _HostState:
+    __slots__ = ('next_slot', 'backoff', 'failures', 'state', 'open_until', 'cooldown',
+                 'latency', 'recent', 'statuses')
+
+    def __init__(self, now):
+        self.next_slot = now
+        self.backoff = 0.0        # extra seconds between two requests
+        self.failures = 0         # consecutive blocked responses
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self.latency = None       # EWMA of response times in seconds
+        self.recent = deque()     # monotonic timestamps of the last minute
+        self.statuses = {}        # status code (or "error") -> count
+
+
+class RateGovernor:
+    """
+    Central pacing for all HTTP requests of the scraper.
+
+    Requests to the same host are spaced by a random delay between min_delay
+    and max_delay, no matter how many threads are scraping in parallel. On
+    429/403/5xx responses and network errors an extra backoff delay doubles
+    (up to max_backoff) and shrinks again with every successful response.
+    After failure_threshold blocked responses in a row the circuit breaker
+    pauses the host for cooldown seconds (or the server's Retry-After), then
+    lets a single probe request through. A failed probe doubles the pause.
+    """
+
+    def __init__(self, min_delay=1.0, max_delay=2.0, max_backoff=120.0, failure_threshold=3,
+                 cooldown=300.0, max_cooldown=3600.0, timeout=30):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.timeout = timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def set_delay(self, min_delay, max_delay):
+        with self._lock:
+            self.min_delay = min_delay
+            self.max_delay = max(min_delay, max_delay)
+
+    def _host(self, host, now):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(now)
+        return state
+
+    def _acquire(self, host):
+        """Blocks until the next free request slot, raises BlockedError while the host is paused."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._host(host, now)
+            if state.state == OPEN:
+                if now < state.open_until:
+                    raise BlockedError(f"{host} paused for {int(state.open_until - now)}s")
+                state.state = HALF_OPEN
+            elif state.state == HALF_OPEN:
+                # Only the probe may pass until it has an answer
+                raise BlockedError(f"{host} is being probed")
+            slot = max(now, state.next_slot)
+            state.next_slot = slot + random.uniform(self.min_delay, self.max_delay) + state.backoff
+
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _record(self, host, status, latency, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            state = self._host(host, now)
+            state.recent.append(now)
+            while state.recent and state.recent[0] < now - 60:
+                state.recent.popleft()
+            state.statuses[status] = state.statuses.get(status, 0) + 1
+            if latency is not None:
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+
+            blocked = status in BLOCK_STATUS
+            failed = blocked or status == "error" or (isinstance(status, int) and status >= 500)
+            if not failed:
+                # Recover gradually, a single success does not undo a backoff
+                state.backoff = state.backoff * 0.75 if state.backoff >= 0.5 else 0.0
+                state.failures = 0
+                if state.state == HALF_OPEN:
+                    state.state = CLOSED
+                    state.cooldown = 0.0
+                return
+
+            state.backoff = min(self.max_backoff, max(2.0, state.backoff * 2))
+            if retry_after:
+                state.next_slot = max(state.next_slot, now + retry_after)
+            if not blocked:
+                if state.state == HALF_OPEN:
+                    state.state = CLOSED  # The host answers, just not well
+                return
+
+            state.failures += 1
+            if state.state == HALF_OPEN or state.failures >= self.failure_threshold:
+                state.cooldown = min(self.max_cooldown, state.cooldown * 2 or self.base_cooldown)
+                state.state = OPEN
+                state.open_until = now + max(state.cooldown, retry_after or 0)
+                state.next_slot = max(state.next_slot, state.open_until)
+                logger.warning(f"{host} blocks requests (HTTP {status}), pausing for {int(state.open_until - now)}s")
+
+    def request(self, session, url, method="GET", **kwargs):
+        """
+        Sends a request through the governor. Returns the response for
+        2xx-4xx answers, raises BlockedError on 429/403 or while the host is
+        paused and ScrapeError on 5xx and network errors.
+        """
+        import requests  # Loaded on first use, keeps startup fast
+
+        host = urllib.parse.urlsplit(url).netloc
+        self._acquire(host)
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            self._record(host, "error", None)
+            raise ScrapeError(f"Request to {host} failed: {e}") from e
+        except Exception:
+            # Whatever else the session raises (e.g. a broken cassette), a probe must not stay open
+            self._record(host, "error", None)
+            raise
+
+        status = response.status_code
+        self._record(host, status, time.monotonic() - start, _retry_after(response))
+        if status in BLOCK_STATUS:
+            raise BlockedError(f"{host} answered HTTP {status}", status)
+        if status >= 500:
+            raise ScrapeError(f"{host} answered HTTP {status}", status)
+        return response
+
+    def stats(self, host=None):
+        """Current state of one host (or of the busiest one): rate, latency, backoff, status counts."""
+        with self._lock:
+            now = time.monotonic()
+            if host is None:
+                if not self._hosts:
+                    return None
+                host = max(self._hosts, key=lambda h: sum(self._hosts[h].statuses.values()))
+            state = self._hosts.get(host)
+            if state is None:
+                return None
+            state_name = state.state
+            if state_name == OPEN and now >= state.open_until:
+                state_name = HALF_OPEN
+            return {
+                'host': host,
+                'state': state_name,
+                'requests_per_minute': sum(1 for t in state.recent if t >= now - 60),
+                'latency': state.latency,
+                'backoff': state.backoff,
+                'paused_for': max(0.0, state.open_until - now) if state_name == OPEN else 0.0,
+                'statuses': dict(state.statuses),
+            }
+
+    def summary(self):
+        """One line for the status bar."""
+        stats = self.stats()
+        if stats is None:
+            return "Keine Anfragen"
+        text = f"{stats['requests_per_minute']} Anfragen/Min"
+        if stats['latency'] is not None:
+            text += f", {stats['latency'] * 1000:.0f} ms"
+        if stats['state'] == OPEN:
+            return text + f", pausiert ({int(stats['paused_for'])}s)"
+        if stats['backoff']:
+            return text + f", gebremst (+{stats['backoff']:.1f}s)"
+        return text + ", ok"
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None  # HTTP date, we fall back to our own backoff
@@ -3,19 +3,17 @@ from tkinter import ttk, messagebox
 from manager import SearchManager
 import threading
 from categories import CATEGORIES
-import queue
+from log_buffer import LogBuffer, StreamToLogger
+from results_view import ResultsModel
 import sys
 import datetime
+import logging
+import startup
 
-class ConsoleRedirector:
-    def __init__(self, queue):
-        self.queue = queue
+# Lines kept for the console window, older ones are dropped
+CONSOLE_LINES = 2000
 
-    def write(self, text):
-        self.queue.put(text)
-
-    def flush(self):
-        pass
+LEVEL_TAGS = {logging.WARNING: "warning", logging.ERROR: "error", logging.CRITICAL: "error"}
 
 class App:
     def __init__(self, root):
@@ -23,12 +21,18 @@ class App:
         self.root.title("Kleinanzeigen Bot")
         self.root.geometry("700x650")
         
-        # Console Queue
-        self.log_queue = queue.Queue()
-        sys.stdout = ConsoleRedirector(self.log_queue)
-        sys.stderr = ConsoleRedirector(self.log_queue)
+        # Log records go to a bounded buffer, the console window shows it when open
+        self.log_buffer = LogBuffer(CONSOLE_LINES)
+        self.log_buffer.setFormatter(logging.Formatter("%(asctime)s %(message)s", "%H:%M:%S"))
+        logging.getLogger().addHandler(self.log_buffer)
+        logging.getLogger().setLevel(logging.INFO)
+        # Stray prints and tracebacks end up there as well
+        sys.stdout = StreamToLogger(logging.getLogger("stdout"), logging.INFO)
+        sys.stderr = StreamToLogger(logging.getLogger("stderr"), logging.ERROR)
+        self.log_seq = 0
         
         self.manager = SearchManager()
+        startup.phase("manager")
         
         # Theme State
         self.dark_mode = True # Enforce Dark Mode
@@ -39,14 +43,16 @@ class App:
         self.console_window = None
         self.console_text = None
         
+        # Search currently loaded into the inputs by 'Bearbeiten'
+        self.editing = None
+        
         self.create_widgets()
         self.update_search_list()
+        startup.phase("widgets")
         
         # Apply initial theme
         self.apply_theme()
         
-        # Start checking queue
-        self.check_log_queue()
 
     def apply_theme(self):
         # Always Dark Mode
@@ -85,18 +91,32 @@ class App:
             if self.console_window:
                 self.console_window.configure(bg=bg_color)
 
-    def check_log_queue(self):
-        while not self.log_queue.empty():
-            try:
-                text = self.log_queue.get_nowait()
-                if self.console_text:
-                    self.console_text.configure(state="normal")
-                    self.console_text.insert("end", text)
-                    self.console_text.see("end")
-                    self.console_text.configure(state="disabled")
-            except queue.Empty:
-                break
-        self.root.after(100, self.check_log_queue)
+    def refresh_console(self):
+        """Appends new log lines in one batch while the console is open."""
+        if self.console_window is None or not self.console_window.winfo_exists():
+            self.console_text = None
+            return
+        self.log_seq, replace_last, lines = self.log_buffer.since(self.log_seq)
+        if lines:
+            self.append_console(lines, replace_last)
+        self.root.after(250, self.refresh_console)
+
+    def append_console(self, lines, replace_last=False):
+        text = self.console_text
+        follow = text.yview()[1] >= 0.999  # Only scroll along if the user is at the bottom
+        text.configure(state="normal")
+        if replace_last:
+            text.delete("end-2l linestart", "end-1c")
+        args = []
+        for level, line in lines:
+            args += [line + "\n", LEVEL_TAGS.get(level, ())]
+        text.insert("end", *args)
+        excess = int(text.index("end-1c").split(".")[0]) - 1 - CONSOLE_LINES
+        if excess > 0:
+            text.delete("1.0", f"{excess + 1}.0")
+        text.configure(state="disabled")
+        if follow:
+            text.see("end")
 
     def show_console(self):
         if self.console_window is not None and self.console_window.winfo_exists():
@@ -122,6 +142,14 @@ class App:
         scrollbar.pack(side="right", fill="y")
         self.console_text.configure(yscrollcommand=scrollbar.set)
         self.console_text.pack(side="left", fill="both", expand=True)
+        self.console_text.tag_configure("warning", foreground="#e5c07b")
+        self.console_text.tag_configure("error", foreground="#e06c75")
+
+        # Start with what is still buffered, then follow
+        self.log_seq, lines = self.log_buffer.lines()
+        if lines:
+            self.append_console(lines)
+        self.refresh_console()
 
     def create_widgets(self):
         # Input Frame
@@ -182,18 +210,25 @@ class App:
         scrollbar.pack(side="right", fill="y")
         self.tree.configure(yscrollcommand=scrollbar.set)
         
+        # Schedule Settings: each search starts at the start interval, then adapts between min and max
+        schedule_frame = ttk.Frame(self.root, padding=(10, 10, 10, 0))
+        schedule_frame.pack(fill="x")
+        self.schedule_entries = {}
+        for attr, label, scale in (("interval", "Start-Intervall (Min):", 60),
+                                   ("min_interval", "Min. Intervall (Min):", 60),
+                                   ("max_interval", "Max. Intervall (Min):", 60),
+                                   ("requests_per_minute", "Anfragen/Min:", 1)):
+            ttk.Label(schedule_frame, text=label).pack(side="left", padx=2)
+            entry = ttk.Entry(schedule_frame, width=5)
+            entry.pack(side="left", padx=(0, 10))
+            # Intervals are stored in seconds, shown in minutes
+            entry.insert(0, str(max(1, int(getattr(self.manager, attr) / scale))))
+            self.schedule_entries[attr] = (entry, scale)
+
         # Control Frame
         control_frame = ttk.Frame(self.root, padding="10")
         control_frame.pack(fill="x")
         
-        # Interval Settings
-        ttk.Label(control_frame, text="Intervall (Min):").pack(side="left", padx=2)
-        self.entry_interval = ttk.Entry(control_frame, width=5)
-        self.entry_interval.pack(side="left", padx=5)
-        # Load current interval (convert seconds to minutes)
-        current_min = max(1, int(self.manager.interval / 60))
-        self.entry_interval.insert(0, str(current_min))
-        
         self.btn_start = ttk.Button(control_frame, text="Bot Starten", command=self.start_bot)
         self.btn_start.pack(side="left", padx=5)
         
@@ -215,8 +250,25 @@ class App:
         # Status Bar
         self.status_var = tk.StringVar()
         self.status_var.set("Bereit")
-        status_bar = ttk.Label(self.root, textvariable=self.status_var, relief="sunken", anchor="w")
-        status_bar.pack(fill="x", side="bottom")
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(fill="x", side="bottom")
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, relief="sunken", anchor="w")
+        status_bar.pack(fill="x", side="left", expand=True)
+
+        # Request rate and state of the rate governor
+        self.rate_var = tk.StringVar()
+        rate_label = ttk.Label(status_frame, textvariable=self.rate_var, relief="sunken", anchor="e")
+        rate_label.pack(side="right")
+
+        # Where the time of the last cycle went
+        self.cycle_var = tk.StringVar()
+        cycle_frame = ttk.LabelFrame(self.root, text="Letzter Zyklus")
+        cycle_frame.pack(fill="x", side="bottom", padx=2)
+        ttk.Label(cycle_frame, textvariable=self.cycle_var, anchor="w").pack(fill="x", padx=5)
+        # Current poll intervals of the searches
+        self.interval_var = tk.StringVar()
+        ttk.Label(cycle_frame, textvariable=self.interval_var, anchor="w").pack(fill="x", padx=5)
+        self.update_rate_status()
         
         # Connect callback
         self.manager.set_progress_callback(self.on_progress)
@@ -226,6 +278,20 @@ class App:
         self.current_progress = 0
         self.animating = False
 
+    def update_rate_status(self):
+        self.rate_var.set(self.manager.scraper.governor.summary())
+        self.cycle_var.set(self.manager.metrics.cycle_summary() or "Noch kein Zyklus")
+        self.interval_var.set(self.interval_summary())
+        self.root.after(1000, self.update_rate_status)
+
+    def interval_summary(self):
+        intervals = sorted(interval for interval, _ in self.manager.scheduler.intervals().values())
+        if not intervals:
+            return "Intervalle: noch keine Suche geplant"
+        minutes = lambda seconds: f"{seconds / 60:.0f}" if seconds >= 60 else f"{seconds / 60:.1f}"
+        return (f"Intervalle: {len(intervals)} Abfragen, {minutes(intervals[0])}-{minutes(intervals[-1])} Min "
+                f"(Median {minutes(intervals[len(intervals) // 2])} Min)")
+
     def on_progress(self, value):
         """Called from background thread"""
         self.root.after(0, self.set_target_progress, value)
@@ -300,70 +366,104 @@ class App:
         
         tree.pack(fill="both", expand=True, side="left")
         
-        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
-        tree.configure(yscrollcommand=scrollbar.set)
-        
-        # Sort ads by distance
-        def extract_distance(location_str):
-            """Extract distance in km from location string"""
-            import re
-            match = re.search(r'(\d+)\s*km', location_str)
-            if match:
-                return int(match.group(1))
-            return 999999  # Put items without distance at the end
-        
-        sorted_ads = sorted(self.manager.found_ads, key=lambda ad: extract_distance(ad.get('location', '')))
-        
-        # Store all ads with their data
-        all_ads_data = []
-        for ad in sorted_ads:
-            distance = extract_distance(ad.get('location', ''))
-            distance_str = f"{distance} km" if distance < 999999 else "N/A"
-            all_ads_data.append({
-                'title': ad['title'],
-                'price': ad['price'],
-                'location': ad['location'],
-                'distance': distance_str,
-                'link': ad['link'],
-                'distance_val': distance
-            })
-        
-        def populate_tree(filter_text=""):
-            """Populate tree with filtered results"""
-            tree.delete(*tree.get_children())
-            filter_lower = filter_text.lower()
+        
+        # Only the visible rows exist in the tree, the scrollbar maps onto the whole list
+        model = ResultsModel(self.manager.found_ads)
+        state = {'offset': 0, 'rows': 20, 'shown': [], 'filter_job': None}
+        count_var = tk.StringVar()
+        
+        def render():
+            """Updates the visible rows in place, only changed rows are touched"""
+            state['offset'] = model.clamp(state['offset'], state['rows'])
+            ads = model.window(state['offset'], state['rows'])
+            for i, ad in enumerate(ads):
+                iid = f"row{i}"
+                distance_str = f"{ad.distance_km} km" if ad.distance_km is not None else "N/A"
+                values = (ad.title, ad.price, ad.location, distance_str, ad.link)
+                if i >= len(state['shown']):
+                    tree.insert("", "end", iid=iid, values=values)
+                elif state['shown'][i] is not ad:
+                    tree.item(iid, values=values)
+            for i in range(len(ads), len(state['shown'])):
+                tree.delete(f"row{i}")
+            state['shown'] = ads
             
-            for ad_data in all_ads_data:
-                if not filter_lower or filter_lower in ad_data['title'].lower():
-                    tree.insert("", "end", values=(
-                        ad_data['title'],
-                        ad_data['price'],
-                        ad_data['location'],
-                        ad_data['distance'],
-                        ad_data['link']
-                    ))
-        
-        # Initial population
-        populate_tree()
-        
-        # Filter on key release
+            total = len(model)
+            if total:
+                scrollbar.set(state['offset'] / total, min(1.0, (state['offset'] + state['rows']) / total))
+            else:
+                scrollbar.set(0, 1)
+            count_var.set(f"{total} von {len(model.ads)} Anzeigen")
+        
+        def on_scroll(*args):
+            if args[0] == "moveto":
+                state['offset'] = int(float(args[1]) * len(model))
+            elif args[0] == "scroll":
+                step = state['rows'] if args[2] == "pages" else 1
+                state['offset'] += int(args[1]) * step
+            render()
+        
+        scrollbar.configure(command=on_scroll)
+        
+        def on_wheel(event):
+            if event.num == 4 or event.delta > 0:
+                on_scroll("scroll", -3, "units")
+            else:
+                on_scroll("scroll", 3, "units")
+            return "break"
+        
+        tree.bind("<MouseWheel>", on_wheel)
+        tree.bind("<Button-4>", on_wheel)
+        tree.bind("<Button-5>", on_wheel)
+        
+        row_height = int(self.style.lookup("Treeview", "rowheight") or 20)
+        
+        def on_resize(event):
+            rows = max(1, (event.height - 25) // row_height)  # minus the heading
+            if rows != state['rows']:
+                state['rows'] = rows
+                render()
+        
+        tree.bind("<Configure>", on_resize)
+        
+        # Filter after a short typing pause instead of on every key
+        def apply_filter():
+            state['filter_job'] = None
+            if model.set_filter(filter_entry.get()):
+                state['offset'] = 0
+                render()
+        
         def on_filter_change(event):
-            populate_tree(filter_entry.get())
+            if state['filter_job'] is not None:
+                top.after_cancel(state['filter_job'])
+            state['filter_job'] = top.after(200, apply_filter)
         
         filter_entry.bind("<KeyRelease>", on_filter_change)
         
+        # New results found while the window is open show up without reopening it
+        def poll_results():
+            if not top.winfo_exists():
+                return
+            if model.refresh():
+                render()
+            top.after(1000, poll_results)
+        
+        poll_results()
+        
         def on_double_click(event):
             item = tree.selection()
             if not item:
                 return
-            values = tree.item(item, "values")
-            link = values[4]  # Link is now at index 4
-            import webbrowser
-            webbrowser.open(link)
+            index = tree.index(item[0])
+            if index < len(state['shown']):
+                import webbrowser
+                webbrowser.open(state['shown'][index].link)
             
         tree.bind("<Double-1>", on_double_click)
         
+        ttk.Label(top, textvariable=count_var).pack(pady=(5, 0))
         ttk.Label(top, text="Doppelklick auf Eintrag öffnet Link | Filter durchsucht Titel").pack(pady=5)
 
     def add_search(self):
@@ -382,7 +482,13 @@ class App:
             messagebox.showerror("Fehler", "Bitte Suchbegriff eingeben.")
             return
             
-        self.manager.add_search(query, location, radius, category_id, filter_keywords, notify)
+        editing = self.editing
+        self.editing = None
+        if editing is not None and any(s is editing for s in self.manager.searches):
+            index = next(i for i, s in enumerate(self.manager.searches) if s is editing)
+            self.manager.edit_search(index, query, location, radius, category_id, filter_keywords, notify)
+        else:
+            self.manager.add_search(query, location, radius, category_id, filter_keywords, notify)
         self.update_search_list()
         self.entry_query.delete(0, "end")
         self.entry_filter.delete(0, "end")
@@ -427,9 +533,8 @@ class App:
         
         self.var_notify.set(search.get('notifications', True))
         
-        # Remove old entry
-        self.manager.remove_search(index)
-        self.update_search_list()
+        # Saved in place by the next 'Hinzufügen'
+        self.editing = search
         
         messagebox.showinfo("Bearbeiten", "Eintrag geladen. Bitte ändern und auf 'Hinzufügen' klicken.")
 
@@ -459,19 +564,21 @@ class App:
 
     def start_bot(self):
         try:
-            interval_min = int(self.entry_interval.get())
-            if interval_min < 1:
+            values = {attr: int(entry.get()) * scale for attr, (entry, scale) in self.schedule_entries.items()}
+            if min(values.values()) < 1 or values['min_interval'] > values['max_interval']:
                 raise ValueError
-            self.manager.interval = interval_min * 60
-            self.manager.save_config()
         except ValueError:
-            messagebox.showerror("Fehler", "Bitte gültiges Intervall (Minuten) eingeben.")
+            messagebox.showerror("Fehler", "Bitte gültige Intervalle (Minuten, Min. nicht größer als Max.) "
+                                           "und Anfragen pro Minute eingeben.")
             return
+        for attr, value in values.items():
+            setattr(self.manager, attr, value)
+        self.manager.save_config()
 
         self.manager.start_monitoring()
         self.btn_start.config(state="disabled")
         self.btn_stop.config(state="normal")
-        self.status_var.set(f"Bot läuft... (Intervall: {interval_min} Min)")
+        self.status_var.set(f"Bot läuft... (Intervall: {values['min_interval'] // 60}-{values['max_interval'] // 60} Min)")
 
     def stop_bot(self):
         self.manager.stop_monitoring()
@@ -0,0 +1,160 @@
+"""
+End-to-end load test: the full SearchManager loop against the stand-in server.
+
+Simulated time runs `speed` times faster than real time, the manager's
+intervals, request budget and delays are scaled down by the same factor.
+Reports cycle times, requests per new ad found and how long after its
+appearance on the stand-in an ad was notified (all in simulated seconds).
+
+    python loadtest.py --searches 200 --minutes 240 --speed 120
+    python loadtest.py --searches 20 --minutes 60 --rate-limit 0.02 --json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import fixtures
+import manager
+from standin_server import StandinServer, World
+
+QUERIES = sorted({title.split()[0].lower() for title in fixtures.TITLES})
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99), 'max': values[-1], 'count': len(values)}
+
+
+def run(searches=50, minutes=60, speed=60, churn=6.0, latency=0.05, rate_limit=0.0, workers=4, seed=0):
+    """Runs the manager for `minutes` simulated minutes, churn is new ads per search and simulated hour."""
+    world = World(churn=churn * speed / 60, seed=seed)
+    server = StandinServer(world, latency=latency, rate_limit=rate_limit)
+    server.start()
+
+    cycles = []
+    latencies = []
+    notified = []
+    lock = threading.Lock()
+
+    def probe(notification):
+        now = time.monotonic()
+        with lock:
+            for ad in notification.ads:
+                notified.append(ad.id)
+                created = world.created.get(int(ad.id))
+                if created is not None:
+                    latencies.append((now - created) * speed)
+
+    cycle_start = [None]
+
+    def on_progress(value):
+        if value == 0:
+            cycle_start[0] = time.monotonic()
+        elif value == 100 and cycle_start[0] is not None:
+            cycles.append((time.monotonic() - cycle_start[0]) * speed)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager.CONFIG_FILE = os.path.join(tmpdir, "config.json")
+        manager.DETAIL_CACHE_FILE = os.path.join(tmpdir, "details.db")
+        manager.SEEN_ADS_FILE = os.path.join(tmpdir, "seen_ads.db")
+        with open(manager.CONFIG_FILE, 'w') as f:
+            json.dump({
+                'base_url': server.url,
+                'interval': 300 / speed,
+                'min_interval': 60 / speed,
+                'max_interval': 3600 / speed,
+                'requests_per_minute': 30 * speed,
+                'request_delay': [1.0 / speed, 2.0 / speed],
+                'max_workers': workers,
+                'notify_sinks': [],
+                'notify_per_minute': 5 * speed,
+                'request_log': os.path.join(tmpdir, "http_requests.jsonl"),
+            }, f)
+
+        mgr = manager.SearchManager()
+        governor = mgr.scraper.governor
+        governor.max_backoff /= speed
+        governor.base_cooldown /= speed
+        governor.max_cooldown /= speed
+        mgr.notifier.coalesce /= speed
+        mgr.notifier.sinks = [probe]
+        mgr.set_progress_callback(on_progress)
+
+        rnd = random.Random(seed)
+        for _ in range(searches):
+            _, town = rnd.choice(fixtures.PLACES)
+            mgr.add_search(rnd.choice(QUERIES), town, rnd.choice([0, 10, 50]))
+
+        started = time.monotonic()
+        mgr.start_monitoring()
+        time.sleep(minutes * 60 / speed)
+        mgr.stop_monitoring()
+        if mgr.thread:
+            mgr.thread.join()
+        mgr.notifier.close()
+        mgr.writer.close()
+        elapsed = time.monotonic() - started
+        server.shutdown()
+        server.server_close()
+
+    fetched = server.requests.get('search', 0) + server.requests.get('detail', 0)
+    return {
+        'searches': searches,
+        'simulated_minutes': minutes,
+        'real_seconds': round(elapsed, 1),
+        'cycles': percentiles(cycles),
+        'requests': dict(server.requests),
+        'new_ads_notified': len(notified),
+        'requests_per_new_ad': round(fetched / len(notified), 2) if notified else None,
+        'notification_latency': percentiles(latencies),
+        'stages': mgr.metrics.snapshot()['stages'],
+    }
+
+
+def report(result):
+    print(f"{result['searches']} searches, {result['simulated_minutes']} simulated minutes "
+          f"in {result['real_seconds']} s")
+    for name, label in (('cycles', "Cycle time"), ('notification_latency', "Notification latency")):
+        stats = result[name]
+        if stats:
+            print(f"  {label:22} p50 {stats['p50']:8.1f} s  p90 {stats['p90']:8.1f} s  "
+                  f"p99 {stats['p99']:8.1f} s  max {stats['max']:8.1f} s  (n={stats['count']})")
+    print(f"  Requests               {result['requests']}")
+    print(f"  New ads notified       {result['new_ads_notified']}")
+    print(f"  Requests per new ad    {result['requests_per_new_ad']}")
+    for stage, stats in sorted(result['stages'].items()):
+        print(f"  Stage {stage:16} {stats['count']:6}x  {stats['sum']:8.2f} s real")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--searches', type=int, default=50)
+    parser.add_argument('--minutes', type=float, default=60, help="simulated minutes")
+    parser.add_argument('--speed', type=float, default=60, help="simulated seconds per real second")
+    parser.add_argument('--churn', type=float, default=6.0, help="new ads per search and simulated hour")
+    parser.add_argument('--latency', type=float, default=0.05, help="real seconds per answer of the stand-in")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="share of answers that are 429")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = run(args.searches, args.minutes, args.speed, args.churn, args.latency, args.rate_limit,
+                 args.workers, args.seed)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        report(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
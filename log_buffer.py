@@ -0,0 +1,108 @@
+"""
+Bounded log storage for the GUI console.
+
+LogBuffer is a logging handler that keeps the last `capacity` formatted
+records in a ring buffer, whether a console window is open or not. The
+console asks for everything after the last sequence number it has shown
+and inserts the batch in one go. Identical consecutive messages are folded
+into one line with a repeat counter.
+"""
+import logging
+import threading
+from collections import deque
+
+
+class LogLine:
+    __slots__ = ('first_seq', 'seq', 'level', 'text', 'repeat')
+
+    def __init__(self, seq, level, text):
+        self.first_seq = seq
+        self.seq = seq  # bumped with every repeat
+        self.level = level
+        self.text = text
+        self.repeat = 1
+
+    def render(self):
+        return self.text if self.repeat == 1 else f"{self.text} (x{self.repeat})"
+
+
+class LogBuffer(logging.Handler):
+
+    def __init__(self, capacity=2000, level=logging.INFO):
+        super().__init__(level)
+        self.capacity = capacity
+        self._lines = deque(maxlen=capacity)
+        self._seq = 0
+        self._buffer_lock = threading.Lock()
+        self._last_message = None
+
+    def emit(self, record):
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        message = (record.levelno, record.getMessage())
+        with self._buffer_lock:
+            self._seq += 1
+            if message == self._last_message and self._lines:
+                # Same message again: bump the counter, the line counts as changed
+                line = self._lines.pop()
+                line.repeat += 1
+                line.seq = self._seq
+                self._lines.append(line)
+            else:
+                self._lines.append(LogLine(self._seq, record.levelno, text))
+                self._last_message = message
+
+    def since(self, seq):
+        """
+        Returns (last seq, replace_last, lines) for a reader that has shown
+        everything up to seq. replace_last is True if its last line got a new
+        repeat count and has to be replaced by the first of lines.
+        """
+        with self._buffer_lock:
+            lines = []
+            for line in reversed(self._lines):
+                if line.seq <= seq:
+                    break
+                lines.append(line)
+            lines.reverse()
+            replace_last = bool(lines) and lines[0].first_seq <= seq
+            return self._seq, replace_last, [(line.level, line.render()) for line in lines]
+
+    def lines(self):
+        """Everything still in the buffer, oldest first."""
+        with self._buffer_lock:
+            return self._seq, [(line.level, line.render()) for line in self._lines]
+
+    def __len__(self):
+        return len(self._lines)
+
+
+class StreamToLogger:
+    """File-like object that turns writes (stray prints, tracebacks) into log records, line by line."""
+
+    def __init__(self, logger, level):
+        self.logger = logger
+        self.level = level
+        self._partial = ""
+        self._writing = threading.local()
+
+    def write(self, text):
+        if getattr(self._writing, 'active', False):
+            return  # A handler failed and reports it on stderr, do not loop
+        self._partial += text
+        *lines, self._partial = self._partial.split("\n")
+        self._writing.active = True
+        try:
+            for line in lines:
+                if line.strip():
+                    self.logger.log(self.level, line.rstrip())
+        finally:
+            self._writing.active = False
+
+    def flush(self):
+        if self._partial.strip():
+            self.logger.log(self.level, self._partial.rstrip())
+        self._partial = ""
@@ -1,11 +1,16 @@
+import startup
 import tkinter as tk
 from gui import App
+startup.phase("imports")
 
 def main():
     root = tk.Tk()
+    startup.phase("tk")
     # Optional: Set icon
     # root.iconbitmap('icon.ico') 
     app = App(root)
+    # First idle callback: the window is drawn and takes input
+    root.after_idle(startup.interactive)
     root.mainloop()
 
 if __name__ == "__main__":
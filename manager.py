@@ -1,23 +1,85 @@
+import copy
 import json
 import threading
 import time
+import logging
 import os
-import random
-from plyer import notification
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from scraper import KleinanzeigenScraper
+from detail_cache import DetailCache
+from seen_store import SeenAdsStore
+from persistence import ConfigWriter
+from result_store import ResultStore
+from matcher import KeywordMatcher, rule_for
+from ad import normalize
+from planner import plan_cycle, search_key
+from scraper import ad_number, ScrapeError, BlockedError
+from scheduler import AdaptiveScheduler
+from verdicts import VerdictCache, definition_hash
+from notifier import NotificationDispatcher, make_sink
+from metrics import Metrics, RequestLog
+
+logger = logging.getLogger(__name__)
 
 CONFIG_FILE = "config.json"
+DETAIL_CACHE_FILE = "details.db"
+SEEN_ADS_FILE = "seen_ads.db"
+
+# Learned while scanning, not part of what a user edits
+RUNTIME_FIELDS = ('watermark', 'rate', 'first_run', 'pending')
+
 
 class SearchManager:
-    def __init__(self):
-        self.scraper = KleinanzeigenScraper()
+    def __init__(self, seen_ads=None):
         self.searches = []
-        self.seen_ads = set()
+        # Every change of the search dicts and every snapshot of them holds this lock,
+        # the loop, the scan workers, the GUI and the control API all touch them
+        self.searches_lock = threading.RLock()
+        # Cluster workers pass the coordinator's store instead
+        self.seen_ads = seen_ads if seen_ads is not None else SeenAdsStore(SEEN_ADS_FILE)
+        self.seen_max_age_days = 30  # Forget ads that have not been listed for this long
         self.running = False
         self.thread = None
-        self.interval = 60 * 5  # 5 Minutes default
+        self.interval = 60 * 5  # 5 Minutes default, starting interval of a new search
+        self.min_interval = 60  # Poll interval bounds, adapted to how busy a search is
+        self.max_interval = 60 * 60
+        self.requests_per_minute = 30  # Budget shared by all searches
+        self.max_workers = 4  # Parallel searches / detail fetches
+        self.request_delay = [1.0, 2.0]  # Seconds between two requests to the same host
+        self.detail_ttl = 2 * 24 * 3600  # Seconds before a cached description is fetched again
+        self.parser = "stream"  # "stream" or the BeautifulSoup reference "bs4"
+        self.max_results = 10000  # Session results kept for the results window
+        self.whole_words = False  # Keywords only match whole words
+        self.max_pages = 5  # Result pages fetched per search when many new ads come in
+        self.notify_sinks = ["desktop"]  # "desktop", "file:<path>", "http://<webhook>"
+        self.digest_threshold = 3  # New ads of one search in a burst that become one digest
+        self.notify_per_minute = 5
+        self.request_log = "http_requests.jsonl"  # One JSON line per HTTP request, "" disables it
+        self.base_url = "https://www.kleinanzeigen.de"  # Or a stand-in server for load tests
+        self.transport = "live"  # "live", "record" or "replay" answers from cassette_dir
+        self.cassette_dir = "cassettes"
+        self.matcher = None
+        self.title_hits = {}  # ad id -> keyword hits in the title, per scan
+        self.desc_hits = {}  # ad id -> Future of the keyword hits in the description, per scan
+        self.memo_lock = threading.Lock()
+        self.fingerprints = {}  # (group key, rules, whole_words) -> (page 1 fingerprint, ids of the last pass)
+        self.fingerprint_stats = {'hits': 0, 'misses': 0, 'skipped_ads': 0}
+        self.verdicts = VerdictCache()  # (search definition, ad id) -> match, across scans
+        self.scheduler = AdaptiveScheduler()
+        self.deferred = deque(maxlen=5000)  # (search, rule, ad) left open by seeding passes
         self.load_config()
-        self.found_ads = [] # Store found ads in memory for the session
+        self.metrics = Metrics(RequestLog(self.request_log) if self.request_log else None)
+        self.detail_cache = DetailCache(DETAIL_CACHE_FILE, ttl=self.detail_ttl)
+        self.scraper = KleinanzeigenScraper(self.request_delay, max_connections=self.max_workers * 2,
+                                            parser=self.parser, metrics=self.metrics, base_url=self.base_url,
+                                            transport=self.transport, cassette_dir=self.cassette_dir)
+        self.detail_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.writer = ConfigWriter(CONFIG_FILE)
+        self.bytes_reported = 0
+        self.found_ads = ResultStore(self.max_results) # Store found ads in memory for the session
+        self.notifier = NotificationDispatcher([], metrics=self.metrics)
+        self._configure_notifier()
         self.progress_callback = None
 
     def set_progress_callback(self, callback):
@@ -28,47 +90,148 @@ class SearchManager:
             try:
                 with open(CONFIG_FILE, 'r') as f:
                     data = json.load(f)
-                    self.searches = data.get('searches', [])
-                    self.seen_ads = set(data.get('seen_ads', []))
+                    with self.searches_lock:
+                        self.searches = data.get('searches', [])
+                    if 'seen_ads' in data:
+                        # Older configs kept the seen ids in the JSON file
+                        self.seen_ads.update(data['seen_ads'])
                     self.interval = data.get('interval', 300)
+                    self.min_interval = data.get('min_interval', self.min_interval)
+                    self.max_interval = data.get('max_interval', self.max_interval)
+                    self.requests_per_minute = data.get('requests_per_minute', self.requests_per_minute)
+                    self.max_workers = max(1, int(data.get('max_workers', self.max_workers)))
+                    self.request_delay = data.get('request_delay', self.request_delay)
+                    self.detail_ttl = data.get('detail_ttl', self.detail_ttl)
+                    self.parser = data.get('parser', self.parser)
+                    self.seen_max_age_days = data.get('seen_max_age_days', self.seen_max_age_days)
+                    self.max_results = data.get('max_results', self.max_results)
+                    self.whole_words = data.get('whole_words', self.whole_words)
+                    self.max_pages = data.get('max_pages', self.max_pages)
+                    self.notify_sinks = data.get('notify_sinks', self.notify_sinks)
+                    self.digest_threshold = data.get('digest_threshold', self.digest_threshold)
+                    self.notify_per_minute = data.get('notify_per_minute', self.notify_per_minute)
+                    self.request_log = data.get('request_log', self.request_log)
+                    self.base_url = data.get('base_url', self.base_url)
+                    self.transport = data.get('transport', self.transport)
+                    self.cassette_dir = data.get('cassette_dir', self.cassette_dir)
             except Exception as e:
-                print(f"Error loading config: {e}")
-        self.found_ads = [] 
+                logger.error(f"Error loading config: {e}")
+        self.seen_ads.max_age_days = self.seen_max_age_days
+
+    def reload_config(self):
+        """
+        Re-reads the config file, e.g. after it was edited by hand.
+        Parser, worker count, request log and transport need a restart.
+        """
+        previous = {(search_key(search), rule_for(search)): search for search in self.snapshot_searches()}
+        # Pending writes would overwrite the hand edit, the scan state in them is merged in below
+        with self.writer.discard_pending():
+            self.load_config()
+        with self.searches_lock:
+            for search in self.searches:
+                before = previous.get((search_key(search), rule_for(search)))
+                if before is None:
+                    search.setdefault('first_run', True)  # Added by hand
+                    continue
+                for field in RUNTIME_FIELDS:
+                    if field in before:
+                        search[field] = before[field]
+                    else:
+                        search.pop(field, None)
+        self.scraper.governor.set_delay(*self.request_delay)
+        self.detail_cache.ttl = self.detail_ttl
+        self.found_ads.max_size = self.max_results
+        self._configure_notifier()
+        self.save_config()
+        logger.info(f"Config reloaded, {len(self.searches)} searches")
+
+    def snapshot_searches(self):
+        """A deep copy of the searches that no other thread changes while it is taken."""
+        with self.searches_lock:
+            return copy.deepcopy(self.searches)
 
     def save_config(self):
-        data = {
-            'searches': self.searches,
-            'seen_ads': list(self.seen_ads),
-            'interval': self.interval
-        }
-        try:
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(data, f, indent=4)
-        except Exception as e:
-            print(f"Error saving config: {e}")
+        """Hands the current state to the background writer, never waits for the disk."""
+        self.writer.update('searches', self.snapshot_searches())
+        self.writer.update(None, {
+            'interval': self.interval,
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+            'requests_per_minute': self.requests_per_minute,
+            'max_workers': self.max_workers,
+            'request_delay': self.request_delay,
+            'detail_ttl': self.detail_ttl,
+            'parser': self.parser,
+            'seen_max_age_days': self.seen_max_age_days,
+            'max_results': self.max_results,
+            'whole_words': self.whole_words,
+            'max_pages': self.max_pages,
+            'notify_sinks': self.notify_sinks,
+            'digest_threshold': self.digest_threshold,
+            'notify_per_minute': self.notify_per_minute,
+            'request_log': self.request_log,
+            'base_url': self.base_url,
+            'transport': self.transport,
+            'cassette_dir': self.cassette_dir
+        })
 
     def add_search(self, query, location, radius, category_id="0", filter_keywords=None, notifications=True):
-        self.searches.append({
-            'query': query,
-            'location': location,
-            'radius': radius,
-            'category_id': category_id,
-            'filter_keywords': filter_keywords or [], 
-            'active': True,
-            'notifications': notifications,
-            'first_run': True # Suppress notifications on first run
-        })
+        with self.searches_lock:
+            self.searches.append({
+                'query': query,
+                'location': location,
+                'radius': radius,
+                'category_id': category_id,
+                'filter_keywords': filter_keywords or [], 
+                'active': True,
+                'notifications': notifications,
+                'first_run': True # Suppress notifications on first run
+            })
+            index = len(self.searches) - 1
+        self.save_config()
+        return index
+
+    def edit_search(self, index, query, location, radius, category_id="0", filter_keywords=None, notifications=True):
+        """Changes a search in place. A new definition starts over like a new search."""
+        with self.searches_lock:
+            if not 0 <= index < len(self.searches):
+                return
+            search = self.searches[index]
+            before = (search_key(search), rule_for(search))
+            search.update({
+                'query': query,
+                'location': location,
+                'radius': radius,
+                'category_id': category_id,
+                'filter_keywords': filter_keywords or [],
+                'notifications': notifications,
+            })
+            if (search_key(search), rule_for(search)) != before:
+                # Watermark and rate belong to the old result list
+                search.pop('watermark', None)
+                search.pop('rate', None)
+                search.pop('pending', None)
+                search['first_run'] = True
         self.save_config()
 
     def remove_search(self, index):
-        if 0 <= index < len(self.searches):
-            del self.searches[index]
-            self.save_config()
+        """Returns the removed search, None if there is none at index."""
+        with self.searches_lock:
+            if not 0 <= index < len(self.searches):
+                return None
+            search = self.searches.pop(index)
+        self.save_config()
+        return search
 
     def toggle_notifications(self, index):
-        if 0 <= index < len(self.searches):
-            self.searches[index]['notifications'] = not self.searches[index].get('notifications', True)
-            self.save_config()
+        """Returns the new notification setting, None if there is no search at index."""
+        with self.searches_lock:
+            if not 0 <= index < len(self.searches):
+                return None
+            search = self.searches[index]
+            search['notifications'] = enabled = not search.get('notifications', True)
+        self.save_config()
+        return enabled
 
     def start_monitoring(self):
         if self.running:
@@ -76,129 +239,405 @@ class SearchManager:
         self.running = True
         self.thread = threading.Thread(target=self._loop, daemon=True)
         self.thread.start()
-        print("Monitoring started.")
+        logger.info("Monitoring started.")
 
     def stop_monitoring(self):
         self.running = False
         if self.thread:
             self.thread.join(timeout=1)
-        print("Monitoring stopped.")
+        logger.info("Monitoring stopped.")
 
-    def _loop(self):
-        while self.running:
-            active_searches = [s for s in self.searches if s.get('active', True)]
-            total_searches = len(active_searches)
-            print(f"Checking for new ads... ({total_searches} active searches)")
-            
-            if self.progress_callback:
-                self.progress_callback(0)
-
-            for i, search in enumerate(active_searches):
-                if not self.running:
-                    break
-                
-                # Report progress start of item
-                if self.progress_callback:
-                    progress = int((i / total_searches) * 100)
-                    self.progress_callback(progress)
+    def _configure_notifier(self):
+        sinks = []
+        for spec in self.notify_sinks:
+            try:
+                sinks.append(make_sink(spec))
+            except ValueError as e:
+                logger.warning(str(e))
+        self.notifier.sinks = sinks
+        self.notifier.digest_threshold = self.digest_threshold
+        self.notifier.max_per_window = self.notify_per_minute
+
+    def _configure_scheduler(self):
+        self.scheduler.default_interval = self.interval
+        self.scheduler.min_interval = min(self.min_interval, self.max_interval)
+        self.scheduler.max_interval = self.max_interval
+        self.scheduler.requests_per_minute = self.requests_per_minute
 
-                query = search['query']
-                location = search['location']
-                radius = search['radius']
-                category_id = search.get('category_id', "0")
-                filter_keywords = search.get('filter_keywords', [])
-                notifications_enabled = search.get('notifications', True)
-                first_run = search.get('first_run', False)
-                
-                print(f"Searching for {query} in {location} (Cat: {category_id})")
+    def _loop(self):
+        # Groups run in parallel, pacing is handled by the scraper's rate governor
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while self.running:
                 try:
-                    results = self.scraper.search(query, location, radius, category_id)
-                    print(f"Found {len(results)} ads for {query}")
-                    
-                    new_count = 0
-                    for ad in results:
-                        # STRICT CHECK: The main query MUST be present in Title or Description
-                        match_query = False
-                        if query.lower() in ad['title'].lower():
-                            match_query = True
-                        else:
-                            # print(f"Query '{query}' not in title '{ad['title']}', checking description...")
-                            desc = self.scraper.get_ad_details(ad['link'])
-                            if query.lower() in desc.lower():
-                                match_query = True
-                        
-                        if not match_query:
-                            continue
-
-                        # Check filter keywords if present
-                        if filter_keywords:
-                            match_filter = False
-                            if any(k.lower() in ad['title'].lower() for k in filter_keywords):
-                                match_filter = True
-                            else:
-                                # print(f"Checking description for filter in {ad['title']}...")
-                                desc = self.scraper.get_ad_details(ad['link'])
-                                if any(k.lower() in desc.lower() for k in filter_keywords):
-                                    match_filter = True
-                            
-                            if not match_filter:
-                                continue 
-
-                        # Add to session results if not already present
-                        if not any(existing['id'] == ad['id'] for existing in self.found_ads):
-                            self.found_ads.append(ad)
-
-                        ad_id = ad['id']
-                        if ad_id not in self.seen_ads:
-                            self.seen_ads.add(ad_id)
-                            new_count += 1
-                            
-                            # Notify only if enabled and NOT first run
-                            if notifications_enabled and not first_run:
-                                self.notify_new_ad(ad)
-                    
-                    if new_count > 0:
-                        print(f"Found {new_count} new ads for {query}")
-                    
-                    # After processing, disable first_run flag
-                    if first_run:
-                        search['first_run'] = False
-                        self.save_config() 
-                
+                    self._cycle(pool)
                 except Exception as e:
-                    print(f"Error processing search '{query}': {e}")
+                    # One bad cycle is logged, monitoring goes on
+                    logger.exception(f"Cycle failed: {e}")
+                    time.sleep(1)
 
-                # Short pause between searches
-                time.sleep(random.uniform(2, 5) if 'random' in globals() else 3)
-                
+    def _cycle(self, pool):
+        """Polls the groups that are due, or waits a little if none is."""
+        active_searches = [s for s in self.searches if s.get('active', True)]
+        groups = {group.key: group for group in plan_cycle(active_searches)}
+        self._configure_scheduler()
+        # A new search does not wait for the next poll of the group it joined
+        joined = {key for key, group in groups.items()
+                  if any(search.get('first_run', False) for search in group.searches)}
+        self.scheduler.sync(groups, rates={key: group.rate() for key, group in groups.items()}, due=joined)
+
+        due = [groups[key] for key in self.scheduler.pop_due(len(groups))]
+        if not due:
+            # Wait for the next due search, new searches are due right away
+            wait = self.scheduler.seconds_until_due()
+            if self.deferred and (wait is None or wait > 5):
+                # Idle time goes to the ads seeding passes left undecided
+                self._evaluate_deferred(self.max_workers)
+                return
+            time.sleep(1 if wait is None else min(1, max(0.05, wait)))
+            return
+
+        total_searches = sum(len(group.searches) for group in due)
+        logger.info(f"Checking for new ads... ({total_searches} of {len(active_searches)} searches due, "
+              f"{self.max_workers} workers)")
+
+        if self.progress_callback:
+            self.progress_callback(0)
+
+        unfinished = {group.key for group in due}
+        try:
+            self.metrics.start_cycle()
+            self.compile_matcher(active_searches)
+            self.fingerprints = {k: v for k, v in self.fingerprints.items() if k[0] in groups}
+
+            futures = {pool.submit(self._process_group, group): group for group in due}
+            done = 0
+            for future in as_completed(futures):
+                group = futures[future]
+                outcome = future.result()
+                if outcome is None:
+                    self.scheduler.release(group.key)
+                else:
+                    rate = self.scheduler.record(group.key, *outcome)
+                    with self.searches_lock:
+                        group.set_rate(rate)
+                unfinished.discard(group.key)
+                done += len(group.searches)
                 # Report progress end of item
                 if self.progress_callback:
-                    progress = int(((i + 1) / total_searches) * 100)
+                    progress = int((done / total_searches) * 100)
                     self.progress_callback(progress)
-            
-            # Loop finished
-            if self.progress_callback:
-                self.progress_callback(100)
+        finally:
+            # Groups of a failed cycle must not stay marked as running
+            for key in unfinished:
+                self.scheduler.release(key)
 
+        # Loop finished
+        if self.progress_callback:
+            self.progress_callback(100)
+
+        with self.metrics.time("persist"):
             self.save_config()
+            evicted = self.seen_ads.evict()
+        if evicted:
+            logger.info(f"Forgot {evicted} ads not listed for {self.seen_max_age_days} days")
+        written = self.writer.bytes_written - self.bytes_reported
+        self.bytes_reported += written
+        logger.info(f"Config: {written} bytes written since last scan ({self.writer.writes} writes total)")
+        transfer = self.scraper.transfer_stats.summary()
+        if transfer:
+            logger.info(f"Downloads: {transfer}")
+        if self.verdicts.hits:
+            logger.info(f"Verdict memo: {len(self.verdicts)} ads remembered, "
+                        f"{self.verdicts.hits} evaluations saved")
+        stats = self.fingerprint_stats
+        checked = stats['hits'] + stats['misses']
+        if checked:
+            logger.info(f"Unchanged result pages: {stats['hits']}/{checked} ({stats['hits'] / checked:.0%}), "
+                  f"{stats['skipped_ads']} ads not re-evaluated")
+
+        wait = self.scheduler.seconds_until_due()
+        self.metrics.end_cycle()
+        logger.info(f"Cycle: {self.metrics.cycle_summary()}")
+        logger.info(f"Scan complete. Next search due in {int(wait or 0)} seconds...")
+
+    def _process_group(self, group):
+        """
+        Fetches one result list and evaluates it for every search that requested it.
+        Returns (new ids on the list or None if unknown, requests made), None on error.
+        """
+        if not self.running:
+            return None
+
+        query, location, radius, category_id = group.key
+        matcher = self.matcher
+        
+        logger.info(f"Searching for {query} in {location} (Cat: {category_id})")
+        try:
+            rules = {rule_for(search) for search in group.searches}
+            definitions = {rule: definition_hash(group.key, rule, self.whole_words) for rule in rules}
+            # A changed search definition or a first run must see the full page
+            state_key = (group.key, frozenset(rules), self.whole_words)
+            first_run = any(search.get('first_run', False) for search in group.searches)
+            # Rules only new searches use are seeded from the result page, without detail requests
+            seeding = {rule for rule in rules
+                       if all(s.get('first_run', False) for s in group.searches if rule_for(s) == rule)}
+            known = None if first_run else self.fingerprints.get(state_key)
+
+            watermark = group.watermark()
+            results = []
+            ids = set()
+            pages = []
+            for page in self.scraper.search_pages(query, location, radius, category_id, watermark, self.max_pages,
+                                                  fingerprint=known[0] if known else None):
+                pages.append(page)
+                # Ads can move to the next page while we are paging
+                results.extend(ad for ad in page if ad.id not in ids)
+                ids.update(ad.id for ad in page)
+
+            if pages and pages[0].unchanged:
+                with self.memo_lock:
+                    self.fingerprint_stats['hits'] += 1
+                    self.fingerprint_stats['skipped_ads'] += len(known[1])
+                self.seen_ads.touch(known[1])
+                for definition in definitions.values():
+                    self.verdicts.seen(definition, known[1])
+                logger.info(f"No changes for {query}")
+                return 0, 1
+
+            logger.info(f"Found {len(results)} ads for {query}" + (f" on {len(pages)} pages" if len(pages) > 1 else ""))
+            with self.metrics.time("persist"):
+                self.seen_ads.touch(ad.id for ad in results)
+            new_ads = None
+            if known:
+                # Only ads that were not on the list last time need a verdict
+                delta = [ad for ad in results if ad.id not in known[1]]
+                with self.memo_lock:
+                    self.fingerprint_stats['misses'] += 1
+                    self.fingerprint_stats['skipped_ads'] += len(results) - len(delta)
+                results = delta
+                new_ads = len(delta)
+            else:
+                with self.memo_lock:
+                    self.fingerprint_stats['misses'] += 1
+
+            with self.metrics.time("match"):
+                # Ads decided on an earlier pass keep their verdict
+                result_ids = [ad.id for ad in results]
+                verdicts = {rule: self.verdicts.get_many(definition, result_ids)
+                            for rule, definition in definitions.items()}
+
+                # Titles and descriptions are scanned once per scan, whichever search sees the ad first
+                title_hits = {ad.id: self.scan_title(ad) for ad in results
+                              if any(ad.id not in v for v in verdicts.values())}
+                for rule, rule_verdicts in verdicts.items():
+                    for ad in results:
+                        if ad.id not in rule_verdicts:
+                            rule_verdicts[ad.id] = matcher.decide(rule, title_hits[ad.id])
+
+            # Fetch all needed descriptions up front and in parallel
+            need_details = [ad for ad in results
+                            if any(v[ad.id] is None for rule, v in verdicts.items() if rule not in seeding)]
+            fetched = 0
+            if need_details and self.running:
+                with self.metrics.time("details"):
+                    hits = list(self.detail_pool.map(self._try_description_hits, need_details))
+                fetched = len(need_details)
+                for ad, desc_hits in zip(need_details, hits):
+                    if desc_hits is None:
+                        continue  # Undecided, the next pass tries again
+                    for rule, rule_verdicts in verdicts.items():
+                        if rule_verdicts[ad.id] is None:
+                            rule_verdicts[ad.id] = matcher.decide(rule, title_hits[ad.id], desc_hits)
+
+            for search in group.searches:
+                rule = rule_for(search)
+                if rule in seeding:
+                    undecided = [ad for ad in results if verdicts[rule][ad.id] is None]
+                    # Listed before the search existed, they never notify, even after a restart
+                    if undecided:
+                        with self.searches_lock:
+                            search['pending'] = [ad.id for ad in undecided]
+                    self._defer((search, rule, ad) for ad in undecided)
+                    logger.info(f"Seeded {search['query']} with {len(results)} ads, "
+                                f"{len(undecided)} left for background evaluation")
+                with self.metrics.time("persist"):
+                    self._record_matches(search, results, verdicts[rule])
+
+            for rule, definition in definitions.items():
+                self.verdicts.put_many(definition, verdicts[rule])
+                self.verdicts.seen(definition, ids)
+
+            # Stopped before the descriptions came in or one failed: the undecided ads must be
+            # seen again, so neither the page nor the watermark may move past them
+            if any(v[ad.id] is None for rule, v in verdicts.items() if rule not in seeding for ad in results):
+                return new_ads, len(pages) + fetched
+
+            # Only remember the page once every ad on it got its verdict
+            if pages and pages[0].fingerprint:
+                self.fingerprints[state_key] = (pages[0].fingerprint, frozenset(ids))
+            numbers = [n for n in map(ad_number, ids) if n is not None]
+            if numbers:
+                with self.searches_lock:
+                    group.set_watermark(max(max(numbers), watermark or 0))
+            return new_ads, len(pages) + fetched
+        
+        except BlockedError as e:
+            logger.warning(f"Blocked while searching '{query}': {e}")
+            return None
+        except ScrapeError as e:
+            logger.warning(f"Request failed for search '{query}': {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Error processing search '{query}': {e}")
+            return None
+
+    def _record_matches(self, search, results, verdicts):
+        notifications_enabled = search.get('notifications', True)
+        first_run = search.get('first_run', False)
+        pending = set(search.get('pending', ()))
+        key = search_key(search)
+
+        new_count = 0
+        for ad in results:
+            if not verdicts[ad.id]:
+                continue
+
+            # Add to session results if not already present
+            self.found_ads.add(ad, key)
+
+            # Persisted right away, a crash does not re-notify
+            if not self.seen_ads.add(ad.id):
+                continue
+            new_count += 1
             
-            print(f"Scan complete. Waiting {self.interval} seconds...")
-            # Wait for interval
-            for _ in range(self.interval):
-                if not self.running:
-                    break
-                time.sleep(1)
-
-    def notify_new_ad(self, ad):
+            # Notify only if enabled and NOT first run
+            if notifications_enabled and not first_run and ad.id not in pending:
+                self.notify_new_ad(ad, search['query'])
+        
+        if new_count > 0:
+            logger.info(f"Found {new_count} new ads for {search['query']}")
+
+        if pending and not first_run:
+            # A regular pass decided them before the background queue did
+            with self.searches_lock:
+                search['pending'] = [ad_id for ad_id in search['pending'] if verdicts.get(ad_id) is None]
+        
+        # After processing, disable first_run flag
+        if first_run:
+            with self.searches_lock:
+                search['first_run'] = False
+            self.save_config() 
+
+    def _defer(self, items):
+        """
+        Queues (search, rule, ad) for background evaluation. When the queue is
+        full the oldest items make room. Their ads stay pending, so the regular
+        pass that decides them later does not notify.
+        """
+        dropped = 0
+        for item in items:
+            if len(self.deferred) == self.deferred.maxlen:
+                self.deferred.popleft()
+                dropped += 1
+            self.deferred.append(item)
+        if dropped:
+            logger.warning(f"Background queue full, {dropped} ads are left to regular passes")
+
+    def _evaluate_deferred(self, limit):
+        """
+        Decides up to limit ads a seeding pass left open. Matches go to the
+        session results without a notification, like the rest of a first run.
+        """
+        batch = []
+        while self.deferred and len(batch) < limit:
+            search, rule, ad = self.deferred.popleft()
+            # Removed or edited searches do not need the verdict any more
+            if any(s is search for s in self.searches) and rule_for(search) == rule:
+                batch.append((search, rule, ad))
+        for (search, rule, ad), verdict in zip(batch, self.detail_pool.map(self._decide_deferred, batch)):
+            if verdict is None:
+                continue
+            with self.searches_lock:
+                search['pending'] = [ad_id for ad_id in search.get('pending', ()) if ad_id != ad.id]
+            key = search_key(search)
+            self.verdicts.put_many(definition_hash(key, rule, self.whole_words), {ad.id: verdict})
+            if verdict:
+                self.found_ads.add(ad, key)
+                self.seen_ads.add(ad.id)
+        if batch:
+            self.save_config()
+
+    def _decide_deferred(self, item):
+        search, rule, ad = item
         try:
-            notification.notify(
-                title=f"Neues Angebot: {ad['title'][:30]}...",
-                message=f"{ad['price']} - {ad['location']}\n{ad['title']}",
-                app_name="Kleinanzeigen Bot",
-                timeout=10
-            )
+            return self.matcher.decide(rule, self.scan_title(ad), self.description_hits(ad))
         except Exception as e:
-            print(f"Notification error: {e}")
+            # The ad is decided by a regular pass if it is still listed
+            logger.debug(f"Deferred evaluation of {ad.id} failed: {e}")
+            return None
+
+    def compile_matcher(self, searches):
+        """Rebuilds the keyword matcher if queries or filters changed."""
+        rules = {rule_for(search) for search in searches}
+        # Verdicts of edited or removed searches are of no use any more
+        self.verdicts.retain({definition_hash(search_key(search), rule_for(search), self.whole_words)
+                              for search in searches})
+        if self.matcher is None or set(self.matcher.rules) != rules or self.matcher.whole_words != self.whole_words:
+            self.matcher = KeywordMatcher(rules, whole_words=self.whole_words)
+        # Hits are only reused within one scan
+        self.title_hits = {}
+        self.desc_hits = {}
+
+    def scan_title(self, ad):
+        hits = self.title_hits.get(ad.id)
+        if hits is None:
+            hits = self.title_hits[ad.id] = self.matcher.scan(ad.title_norm)
+        return hits
+
+    def description_hits(self, ad):
+        """
+        Keywords of all searches found in the description. Each ad is fetched
+        and scanned once per scan, concurrent callers wait for the first one.
+        """
+        with self.memo_lock:
+            future = self.desc_hits.get(ad.id)
+            owner = future is None
+            if owner:
+                future = self.desc_hits[ad.id] = Future()
+        if owner:
+            try:
+                future.set_result(self.matcher.scan(normalize(self.get_description(ad))))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def _try_description_hits(self, ad):
+        """description_hits, None if the detail page failed. Only a block fails the whole group."""
+        try:
+            return self.description_hits(ad)
+        except BlockedError:
+            raise
+        except ScrapeError as e:
+            logger.warning(f"Could not load the description of {ad.id}: {e}")
+            return None
+
+    def get_description(self, ad):
+        """Returns the ad description, from the detail cache if possible."""
+        started = time.perf_counter()
+        desc = self.detail_cache.get(ad.id)
+        if desc is not None:
+            self.metrics.request("detail", ad.link, None, time.perf_counter() - started, cache="hit")
+        else:
+            desc = self.scraper.get_ad_details(ad.link)
+            # Empty means deleted ad or no description, fetch errors raise ScrapeError
+            if desc:
+                self.detail_cache.put(ad.id, desc)
+        return desc or ""
+
+    def notify_new_ad(self, ad, search=""):
+        """Hands the ad to the notification thread, the scan never waits for delivery."""
+        if not self.notifier.submit(ad, search):
+            logger.warning(f"Notification queue full, dropped {ad.id}")
 
 if __name__ == "__main__":
     # Test
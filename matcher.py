@@ -0,0 +1,111 @@
+"""
+Keyword matching for all saved searches at once.
+
+All queries and filter keywords are compiled into one Aho-Corasick automaton,
+so a title or description is scanned a single time no matter how many
+searches look at it. The scan returns the set of terms found, each search
+(rule) is then decided with a few set operations.
+"""
+from collections import deque
+
+from ad import normalize
+
+
+def rule_for(search):
+    """The part of a search that decides whether an ad matches."""
+    return (normalize(search['query']),
+            tuple(normalize(k) for k in search.get('filter_keywords', [])))
+
+
+class KeywordMatcher:
+
+    def __init__(self, rules, whole_words=False):
+        self.whole_words = whole_words
+        self.terms = []
+        term_ids = {}
+        self._rules = {}
+        for query, filters in rules:
+            ids = []
+            for term in (query,) + tuple(filters):
+                if term not in term_ids:
+                    term_ids[term] = len(self.terms)
+                    self.terms.append(term)
+                ids.append(term_ids[term])
+            self._rules[(query, tuple(filters))] = (ids[0], frozenset(ids[1:]))
+
+        # An empty keyword is contained in every text
+        self._always = frozenset(i for i, term in enumerate(self.terms) if not term)
+        self._build([(i, term) for i, term in enumerate(self.terms) if term])
+
+    @property
+    def rules(self):
+        return self._rules.keys()
+
+    def _build(self, terms):
+        self._goto = [{}]
+        self._out = [()]
+        for term_id, term in terms:
+            node = 0
+            for ch in term:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._out.append(())
+                node = nxt
+            self._out[node] += (term_id,)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def scan(self, text):
+        """Returns the ids of all terms contained in the (normalized) text."""
+        goto, fail, out, terms = self._goto, self._fail, self._out, self.terms
+        hits = set(self._always)
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                if not self.whole_words:
+                    hits.update(out[node])
+                    continue
+                end = i + 1
+                after_ok = end == len(text) or not text[end].isalnum()
+                if not after_ok:
+                    continue
+                for term_id in out[node]:
+                    start = end - len(terms[term_id])
+                    if start == 0 or not text[start - 1].isalnum():
+                        hits.add(term_id)
+        return frozenset(hits)
+
+    def decide(self, rule, title_hits, desc_hits=None):
+        """
+        True or False, or None if the title alone is not enough and the
+        description is needed (desc_hits not given).
+        """
+        query, filters = self._rules[rule]
+        query_in_title = query in title_hits
+        filter_in_title = not filters or not filters.isdisjoint(title_hits)
+        if query_in_title and filter_in_title:
+            return True
+        if desc_hits is None:
+            return None
+
+        # STRICT CHECK: The main query MUST be present in Title or Description
+        if not query_in_title and query not in desc_hits:
+            return False
+        return filter_in_title or not filters.isdisjoint(desc_hits)
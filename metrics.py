@@ -0,0 +1,173 @@
+"""
+Where the time of a cycle goes.
+
+Metrics keeps a timing histogram per stage (search, parse, match, details,
+persist, notify) and per request kind for the lifetime of the process, plus
+the totals of the current cycle. Stages are timed with
+
+    with metrics.time("match"):
+        ...
+
+Every HTTP request (and every description answered by the detail cache) is
+passed to request(), which counts it and appends one JSON line to the
+request log, a file rotated by size. Search pages compared with a known
+fingerprint are logged as cache "hit" (unchanged, not parsed) or "miss".
+Descriptions the stream parser reads while they download are not timed as
+"parse", that time is part of the request. snapshot() and to_prometheus()
+export everything for the control API.
+"""
+import json
+import logging.handlers
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, the last bucket takes everything above
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, the last bound is '+Inf'."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': round(self.sum, 6),
+                'buckets': {str(bound): count for bound, count in self.cumulative()}}
+
+
+class RequestLog:
+    """Appends one JSON line per request, rotates the file at max_bytes."""
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=3):
+        self.path = path
+        self._handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                             encoding='utf-8', delay=True)
+
+    def write(self, record):
+        self._handler.handle(logging.makeLogRecord({'msg': json.dumps(record, ensure_ascii=False)}))
+
+    def close(self):
+        self._handler.close()
+
+
+class Metrics:
+
+    def __init__(self, request_log=None):
+        self.request_log = request_log
+        self._lock = threading.Lock()
+        self._stages = {}    # stage -> Histogram
+        self._requests = {}  # kind -> Histogram of the wall time
+        self._counts = {}    # (kind, status, cache) -> requests
+        self._bytes = {}     # kind -> bytes
+        self._cycle = {}     # stage -> [count, seconds] of the running cycle
+        self.last_cycle = {}
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self._stages.setdefault(stage, Histogram()).observe(seconds)
+            totals = self._cycle.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def request(self, kind, url, status, seconds, size=0, cache=None):
+        """Records one request. status is None if no response arrived, cache is 'hit', 'miss' or None."""
+        with self._lock:
+            self._requests.setdefault(kind, Histogram()).observe(seconds)
+            key = (kind, status, cache)
+            self._counts[key] = self._counts.get(key, 0) + 1
+            self._bytes[kind] = self._bytes.get(kind, 0) + size
+        if self.request_log is not None:
+            self.request_log.write({
+                'time': round(time.time(), 3),
+                'kind': kind,
+                'url': url,
+                'status': status,
+                'ms': round(seconds * 1000, 1),
+                'bytes': size,
+                'cache': cache,
+            })
+
+    def start_cycle(self):
+        with self._lock:
+            self._cycle = {}
+
+    def end_cycle(self):
+        """Closes the running cycle, returns its stage -> (count, seconds)."""
+        with self._lock:
+            self.last_cycle = {stage: (count, seconds) for stage, (count, seconds) in self._cycle.items()}
+            self._cycle = {}
+            return self.last_cycle
+
+    def cycle_summary(self):
+        """One line for the log and the GUI, slowest stage first."""
+        stages = sorted(self.last_cycle.items(), key=lambda item: -item[1][1])
+        return ", ".join(f"{stage} {seconds:.2f} s ({count}x)" for stage, (count, seconds) in stages)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'stages': {stage: histogram.snapshot() for stage, histogram in self._stages.items()},
+                'requests': {kind: histogram.snapshot() for kind, histogram in self._requests.items()},
+                'request_counts': [{'kind': kind, 'status': status, 'cache': cache, 'count': count}
+                                   for (kind, status, cache), count in self._counts.items()],
+                'bytes': dict(self._bytes),
+                'last_cycle': {stage: {'count': count, 'seconds': round(seconds, 6)}
+                               for stage, (count, seconds) in self.last_cycle.items()},
+            }
+
+    def to_prometheus(self):
+        """The metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for name, label, histograms, help_text in (
+                    ('kleinanzeigen_stage_seconds', 'stage', self._stages, "Wall time per stage"),
+                    ('kleinanzeigen_request_seconds', 'kind', self._requests, "Wall time per HTTP request")):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for value, histogram in sorted(histograms.items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{{label}="{value}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{label}="{value}"}} {histogram.count}')
+
+            lines.append("# HELP kleinanzeigen_requests_total HTTP requests and detail cache hits")
+            lines.append("# TYPE kleinanzeigen_requests_total counter")
+            for (kind, status, cache), count in sorted(self._counts.items(), key=str):
+                lines.append(f'kleinanzeigen_requests_total{{kind="{kind}",status="{status or ""}",'
+                             f'cache="{cache or ""}"}} {count}')
+            lines.append("# HELP kleinanzeigen_bytes_total Bytes received over the wire")
+            lines.append("# TYPE kleinanzeigen_bytes_total counter")
+            for kind, size in sorted(self._bytes.items()):
+                lines.append(f'kleinanzeigen_bytes_total{{kind="{kind}"}} {size}')
+        return "\n".join(lines) + "\n"
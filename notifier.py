@@ -0,0 +1,204 @@
+"""
+Notification delivery off the scan thread.
+
+The scan loop hands new ads to NotificationDispatcher.submit(), which only
+puts them on a bounded queue (and drops them when it is full). A background
+thread collects what arrives within `coalesce` seconds, turns bursts of one
+search into a single digest and sends at most `max_per_window` notifications
+per `window` seconds, everything beyond that is folded into the next digest.
+
+Sinks are callables taking a Notification. make_sink() builds them from the
+config strings:
+
+    "desktop"                          plyer desktop notification
+    "file:notifications.log"           one JSON line per notification
+    "http://127.0.0.1:9000/hook"       POST the notification as JSON
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class Notification:
+    __slots__ = ('title', 'message', 'search', 'ads')
+
+    def __init__(self, title, message, search, ads):
+        self.title = title
+        self.message = message
+        self.search = search
+        self.ads = ads
+
+    def as_dict(self):
+        return {
+            'title': self.title,
+            'message': self.message,
+            'search': self.search,
+            'ads': [ad.as_dict() for ad in self.ads],
+        }
+
+
+def single(search, ad):
+    return Notification(f"Neues Angebot: {ad.title[:30]}...", f"{ad.price} - {ad.location}\n{ad.title}",
+                        search, [ad])
+
+
+def digest(search, ads):
+    lines = [f"{ad.price} - {ad.title}" for ad in ads[:5]]
+    if len(ads) > 5:
+        lines.append(f"... und {len(ads) - 5} weitere")
+    return Notification(f"{len(ads)} neue Angebote: {search}"[:60], "\n".join(lines), search, ads)
+
+
+class DesktopSink:
+
+    def __call__(self, notification):
+        from plyer import notification as desktop
+        desktop.notify(title=notification.title, message=notification.message,
+                       app_name="Kleinanzeigen Bot", timeout=10)
+
+
+class FileSink:
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, notification):
+        record = dict(notification.as_dict(), time=time.strftime("%Y-%m-%d %H:%M:%S"))
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, notification):
+        import urllib.request
+        body = json.dumps(notification.as_dict(), ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json; charset=utf-8"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def make_sink(spec):
+    """Builds a sink from its config string, see the module docstring."""
+    if spec == "desktop":
+        return DesktopSink()
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    if spec.startswith(("http://", "https://")):
+        return WebhookSink(spec)
+    raise ValueError(f"Unknown notification sink: {spec}")
+
+
+class NotificationDispatcher:
+
+    def __init__(self, sinks, max_queue=500, digest_threshold=3, max_per_window=5, window=60, coalesce=2.0,
+                 metrics=None):
+        self.sinks = list(sinks)
+        self.metrics = metrics
+        self.digest_threshold = digest_threshold
+        self.max_per_window = max_per_window
+        self.window = window
+        self.coalesce = coalesce
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = {}  # search -> ads waiting for delivery, in order of arrival
+        self._sent_at = deque()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="NotificationDispatcher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, ad, search=""):
+        """Queues a new ad, never blocks. Returns False if the queue was full and the ad is dropped."""
+        try:
+            self._queue.put_nowait((search, ad))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout=5):
+        """Stops the thread, whatever is still pending goes out in one last round of digests."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._collect(1.0)
+            self._deliver(time.monotonic())
+        # Last round, ignoring the rate limit
+        self._collect(0)
+        self._deliver(None)
+
+    def _collect(self, timeout):
+        """Waits up to timeout for an ad, then keeps taking what arrives within coalesce seconds."""
+        try:
+            items = [self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()]
+        except queue.Empty:
+            return
+        deadline = time.monotonic() + (self.coalesce if timeout else 0)
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for search, ad in items:
+            self._pending.setdefault(search, []).append(ad)
+
+    def _deliver(self, now):
+        if not self._pending:
+            return
+        budget = None
+        if now is not None:
+            while self._sent_at and self._sent_at[0] <= now - self.window:
+                self._sent_at.popleft()
+            budget = self.max_per_window - len(self._sent_at)
+            if budget <= 0:
+                return  # Keeps collecting, the ads go out in a digest later
+
+        notifications = []
+        for search, ads in self._pending.items():
+            if len(ads) >= self.digest_threshold:
+                notifications.append(digest(search, ads))
+            else:
+                notifications.extend(single(search, ad) for ad in ads)
+        if budget is not None and len(notifications) > budget:
+            # More than the window allows: keep what fits, the rest becomes one digest
+            rest = notifications[budget - 1:]
+            ads = [ad for notification in rest for ad in notification.ads]
+            searches = list(dict.fromkeys(notification.search for notification in rest))
+            notifications[budget - 1:] = [digest(", ".join(searches), ads)]
+        self._pending = {}
+
+        for notification in notifications:
+            self._send(notification)
+            if now is not None:
+                self._sent_at.append(now)
+
+    def _send(self, notification):
+        started = time.perf_counter()
+        for sink in self.sinks:
+            try:
+                sink(notification)
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Notification error ({type(sink).__name__}): {e}")
+        self.sent += 1
+        if self.metrics is not None:
+            self.metrics.observe("notify", time.perf_counter() - started)
@@ -0,0 +1,127 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigWriter:
+    """
+    Write-behind persistence for config.json.
+
+    Callers hand in a snapshot per section (a top level key, or a group of
+    them). Sections that did not change are ignored, changed ones are marked
+    dirty and written together once no new change arrived for `delay` seconds
+    (at the latest after `max_delay`). Writing happens on a background thread,
+    into a temp file that then replaces the config, so neither the scan thread
+    nor the Tk main loop ever wait on the disk and a crash never leaves a
+    half written file behind.
+    """
+
+    def __init__(self, path, delay=1.0, max_delay=10.0):
+        self.path = path
+        self.delay = delay
+        self.max_delay = max_delay
+        self.bytes_written = 0
+        self.writes = 0
+        self._sections = {}
+        self._dirty = set()
+        self._first_dirty = 0.0
+        self._last_dirty = 0.0
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="ConfigWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def update(self, section, data):
+        """
+        Stores a snapshot of one section. data must not be mutated afterwards.
+        If section is None, data is a dict of keys written at the top level.
+        """
+        with self._cond:
+            if self._sections.get(section) == data:
+                return
+            self._sections[section] = data
+            self._mark_dirty(section)
+
+    def _mark_dirty(self, section):
+        now = time.monotonic()
+        if not self._dirty:
+            self._first_dirty = now
+        self._last_dirty = now
+        self._dirty.add(section)
+        self._cond.notify()
+
+    def is_dirty(self):
+        with self._cond:
+            return bool(self._dirty)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # Debounce: wait for a quiet period, but never longer than max_delay
+                now = time.monotonic()
+                due = min(self._last_dirty + self.delay, self._first_dirty + self.max_delay)
+                if now < due:
+                    self._cond.wait(due - now)
+                    continue
+            self.flush()
+
+    def flush(self):
+        """Writes pending changes now. Safe to call from any thread."""
+        with self._io_lock:
+            with self._cond:
+                if not self._dirty:
+                    return 0
+                data = {}
+                for section, values in self._sections.items():
+                    if section is None:
+                        data.update(values)
+                    else:
+                        data[section] = values
+                self._dirty.clear()
+            try:
+                payload = json.dumps(data, indent=4).encode("utf-8")
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"Error saving config: {e}")
+                # Try again after the next debounce period
+                with self._cond:
+                    self._mark_dirty(None)
+                return 0
+            self.bytes_written += len(payload)
+            self.writes += 1
+            return len(payload)
+
+    @contextmanager
+    def discard_pending(self):
+        """
+        Drops pending changes without writing them and keeps the writer away
+        from the file until the block ends, e.g. while a hand edit is read.
+        A write that is already in progress is waited for.
+        """
+        with self._io_lock:
+            with self._cond:
+                self._dirty.clear()
+            yield
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
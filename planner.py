@@ -0,0 +1,54 @@
+def search_key(search):
+    """Identifies the result list a search fetches."""
+    return (search['query'], search['location'], str(search['radius']), search.get('category_id', "0"))
+
+
+class FetchGroup:
+    """Searches that request the same result list and share one fetch."""
+    __slots__ = ('key', 'searches')
+
+    def __init__(self, key):
+        self.key = key
+        self.searches = []
+
+    @property
+    def query(self):
+        return self.key[0]
+
+    def watermark(self):
+        """Highest ad id all searches of the group have processed, None if one has none yet."""
+        marks = [search.get('watermark') for search in self.searches]
+        if not marks or None in marks:
+            return None
+        return min(marks)
+
+    def set_watermark(self, value):
+        for search in self.searches:
+            search['watermark'] = value
+
+    def rate(self):
+        """Stored estimate of new ads per second, the busiest search wins."""
+        rates = [search['rate'] for search in self.searches if search.get('rate') is not None]
+        return max(rates) if rates else None
+
+    def set_rate(self, value):
+        for search in self.searches:
+            search['rate'] = value
+
+    def __repr__(self):
+        return f"FetchGroup({self.key!r}, {len(self.searches)} searches)"
+
+
+def plan_cycle(searches):
+    """
+    Collapses searches with identical (query, location, radius, category)
+    into one fetch each, in the order they first appear.
+    """
+    groups = {}
+    for search in searches:
+        key = search_key(search)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = FetchGroup(key)
+        group.searches.append(search)
+    return list(groups.values())
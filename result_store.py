@@ -0,0 +1,115 @@
+import bisect
+import itertools
+import threading
+from collections import OrderedDict
+
+
+class ResultStore:
+    """
+    Session results keyed by ad id.
+
+    Keeps insertion order, remembers which searches found an ad and keeps
+    sorted indexes by price and distance. Once max_size is exceeded the
+    oldest entries are evicted. Writers and readers share one lock, readers
+    only hold it for a plain copy, so the GUI can take a consistent snapshot
+    without stalling the scan thread.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.version = 0
+        self._lock = threading.Lock()
+        self._ads = OrderedDict()
+        self._sources = {}
+        self._by_search = {}
+        self._by_price = []     # sorted (price, seq, ad_id)
+        self._by_distance = []  # sorted (distance, seq, ad_id)
+        self._keys = {}         # ad_id -> (price key, distance key)
+        self._seq = itertools.count()
+        self._snapshot = ()
+        self._snapshot_version = 0
+
+    def __len__(self):
+        return len(self._ads)
+
+    def __contains__(self, ad_id):
+        return ad_id in self._ads
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def get(self, ad_id, default=None):
+        return self._ads.get(ad_id, default)
+
+    def add(self, ad, search_key=None):
+        """Adds an ad, returns False if it was already stored."""
+        ad_id = ad.id
+        with self._lock:
+            if ad_id in self._ads:
+                if search_key is not None and search_key not in self._sources[ad_id]:
+                    self._sources[ad_id].add(search_key)
+                    self._by_search.setdefault(search_key, OrderedDict())[ad_id] = None
+                return False
+
+            seq = next(self._seq)
+            price = ad.price_value
+            distance = ad.distance_km
+            price_key = (float('inf') if price is None else price, seq, ad_id)
+            distance_key = (float('inf') if distance is None else distance, seq, ad_id)
+            bisect.insort(self._by_price, price_key)
+            bisect.insort(self._by_distance, distance_key)
+            self._keys[ad_id] = (price_key, distance_key)
+
+            self._ads[ad_id] = ad
+            self._sources[ad_id] = set()
+            if search_key is not None:
+                self._sources[ad_id].add(search_key)
+                self._by_search.setdefault(search_key, OrderedDict())[ad_id] = None
+
+            while len(self._ads) > self.max_size:
+                self._evict_oldest()
+            self.version += 1
+            return True
+
+    def _evict_oldest(self):
+        ad_id, _ = self._ads.popitem(last=False)
+        for key in self._sources.pop(ad_id):
+            ids = self._by_search.get(key)
+            if ids is not None:
+                ids.pop(ad_id, None)
+                if not ids:
+                    del self._by_search[key]
+        price_key, distance_key = self._keys.pop(ad_id)
+        del self._by_price[bisect.bisect_left(self._by_price, price_key)]
+        del self._by_distance[bisect.bisect_left(self._by_distance, distance_key)]
+
+    def snapshot(self):
+        """All ads in insertion order as an immutable tuple."""
+        if self._snapshot_version != self.version:
+            with self._lock:
+                self._snapshot = tuple(self._ads.values())
+                self._snapshot_version = self.version
+        return self._snapshot
+
+    def sources(self, ad_id):
+        """Keys of the searches that found ad_id."""
+        with self._lock:
+            return frozenset(self._sources.get(ad_id, ()))
+
+    def by_search(self, search_key):
+        with self._lock:
+            return [self._ads[ad_id] for ad_id in self._by_search.get(search_key, ())]
+
+    def sorted_by_price(self, low=None, high=None):
+        """Ads ordered by price, ads without a price come last unless a range is given."""
+        with self._lock:
+            start = 0 if low is None else bisect.bisect_left(self._by_price, (low,))
+            end = len(self._by_price) if high is None else bisect.bisect_right(self._by_price, (high, float('inf')))
+            return [self._ads[key[2]] for key in self._by_price[start:end]]
+
+    def sorted_by_distance(self, max_km=None):
+        """Ads ordered by distance, ads without a distance come last unless max_km is given."""
+        with self._lock:
+            end = len(self._by_distance) if max_km is None else \
+                bisect.bisect_right(self._by_distance, (max_km, float('inf')))
+            return [self._ads[key[2]] for key in self._by_distance[:end]]
@@ -0,0 +1,59 @@
+"""
+Model behind the results window.
+
+Keeps the session results ordered by distance together with their
+normalized titles, applies the filter on that index and hands out only
+the window of rows that is currently visible. Narrowing a filter (typing
+more letters) only searches the previous matches.
+"""
+from ad import normalize
+
+
+class ResultsModel:
+
+    def __init__(self, store):
+        self.store = store
+        self.version = None
+        self.ads = []       # all ads, nearest first
+        self._norms = []    # normalized titles, same order as ads
+        self.filter = ""
+        self.matches = []   # positions in ads that pass the filter
+
+    def refresh(self):
+        """Picks up new results from the store, returns True if anything changed."""
+        version = self.store.version
+        if version == self.version:
+            return False
+        self.version = version
+        self.ads = self.store.sorted_by_distance()
+        self._norms = [ad.title_norm for ad in self.ads]
+        self.matches = self._search(self.filter, range(len(self.ads)))
+        return True
+
+    def _search(self, term, candidates):
+        if not term:
+            return list(candidates)
+        norms = self._norms
+        return [i for i in candidates if term in norms[i]]
+
+    def set_filter(self, text):
+        """Applies a filter on the titles, returns True if the matches changed."""
+        term = normalize(text.strip())
+        if term == self.filter:
+            return False
+        # A longer term can only match a subset of what the old one matched
+        candidates = self.matches if self.filter and self.filter in term else range(len(self.ads))
+        self.filter = term
+        self.matches = self._search(term, candidates)
+        return True
+
+    def __len__(self):
+        return len(self.matches)
+
+    def window(self, start, count):
+        """The ads of rows start .. start + count of the filtered list."""
+        return [self.ads[i] for i in self.matches[start:start + count]]
+
+    def clamp(self, start, count):
+        """First row index that keeps a full window on screen."""
+        return max(0, min(start, len(self.matches) - count))
@@ -0,0 +1,164 @@
+import heapq
+import threading
+import time
+
+
+class _Entry:
+    __slots__ = ('key', 'rate', 'interval', 'next_due', 'last_run', 'running', 'hurried')
+
+    def __init__(self, key, rate, interval, next_due):
+        self.key = key
+        self.rate = rate              # estimated new ads per second, None until observed
+        self.interval = interval
+        self.next_due = next_due
+        self.last_run = None
+        self.running = False
+        self.hurried = False          # pulled forward by sync(due=...), until the next recorded poll
+
+
+class AdaptiveScheduler:
+    """
+    Decides when each fetch group is polled next.
+
+    Every group keeps an exponentially weighted estimate of how many new ads
+    per second show up in its result list. The poll interval is chosen so
+    that about target_new ads arrive between two polls, clamped to
+    [min_interval, max_interval]. Due groups are handed out in due order, but
+    only as long as the shared requests-per-minute budget allows.
+    """
+
+    def __init__(self, min_interval=60, max_interval=3600, default_interval=300,
+                 requests_per_minute=30, alpha=0.3, target_new=1.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.requests_per_minute = requests_per_minute
+        self.alpha = alpha
+        self.target_new = target_new
+        self._entries = {}
+        self._heap = []
+        self._lock = threading.Lock()
+        self._tokens = float(requests_per_minute)
+        self._refilled = None
+
+    def _clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _interval_for(self, rate):
+        if not rate:
+            return self._clamp(self.default_interval) if rate is None else self.max_interval
+        return self._clamp(self.target_new / rate)
+
+    def sync(self, keys, rates=None, now=None, due=()):
+        """
+        Adds new groups (due immediately) and forgets removed ones.
+        rates optionally seeds the estimate of new groups, e.g. from the config.
+        Groups in due, e.g. ones a new search joined, are polled right away,
+        once until their next recorded poll so failures do not repeat at once.
+        """
+        now = time.monotonic() if now is None else now
+        rates = rates or {}
+        with self._lock:
+            keys = set(keys)
+            for key in list(self._entries):
+                if key not in keys:
+                    del self._entries[key]
+            for key in keys:
+                if key not in self._entries:
+                    rate = rates.get(key)
+                    entry = _Entry(key, rate, self._interval_for(rate), now)
+                    self._entries[key] = entry
+                    heapq.heappush(self._heap, (now, key))
+            for key in due:
+                entry = self._entries.get(key)
+                if entry is None or entry.running or entry.hurried:
+                    continue
+                entry.hurried = True
+                if entry.next_due > now:
+                    entry.next_due = now
+                    heapq.heappush(self._heap, (now, key))
+
+    def _refill(self, now):
+        elapsed = 0 if self._refilled is None else max(0.0, now - self._refilled)
+        self._refilled = now
+        self._tokens = min(float(self.requests_per_minute),
+                           self._tokens + elapsed * self.requests_per_minute / 60.0)
+
+    def pop_due(self, limit, now=None):
+        """Returns up to limit keys that are due and fit into the request budget."""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            self._refill(now)
+            while self._heap and len(due) < limit and self._tokens >= 1:
+                next_due, key = self._heap[0]
+                entry = self._entries.get(key)
+                if entry is None or entry.running or entry.next_due != next_due:
+                    heapq.heappop(self._heap)  # stale heap item
+                    continue
+                if next_due > now:
+                    break
+                heapq.heappop(self._heap)
+                entry.running = True
+                self._tokens -= 1
+                due.append(key)
+        return due
+
+    def record(self, key, new_ads, requests=1, now=None):
+        """
+        Reports a finished poll: new_ads new ids were on the result list
+        (None if unknown, e.g. on the first poll) and it took requests requests.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            # The first request was paid for in pop_due
+            self._tokens -= max(0, requests - 1)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if new_ads is not None and entry.last_run is not None:
+                elapsed = max(1.0, now - entry.last_run)
+                observed = new_ads / elapsed
+                # Without history start from the rate that gives the default interval
+                prior = entry.rate if entry.rate is not None else self.target_new / max(1, self.default_interval)
+                entry.rate = self.alpha * observed + (1 - self.alpha) * prior
+            entry.last_run = now
+            entry.interval = self._interval_for(entry.rate)
+            entry.next_due = now + entry.interval
+            entry.running = False
+            entry.hurried = False
+            heapq.heappush(self._heap, (entry.next_due, key))
+            return entry.rate
+
+    def release(self, key, now=None):
+        """Puts a group back without an observation, e.g. after an error."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.running = False
+            entry.next_due = now + entry.interval
+            heapq.heappush(self._heap, (entry.next_due, key))
+
+    def seconds_until_due(self, now=None):
+        """Time until the next group is due or the budget allows the next poll."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._refill(now)
+            wait = None
+            for next_due, key in self._heap:
+                entry = self._entries.get(key)
+                if entry is not None and not entry.running and entry.next_due == next_due:
+                    wait = next_due - now if wait is None else min(wait, next_due - now)
+            if wait is None:
+                return None
+            if self._tokens < 1:
+                wait = max(wait, (1 - self._tokens) * 60.0 / self.requests_per_minute)
+            return max(0.0, wait)
+
+    def intervals(self):
+        """key -> (current interval, estimated new ads per hour)"""
+        with self._lock:
+            return {key: (e.interval, e.rate * 3600 if e.rate is not None else None)
+                    for key, e in self._entries.items()}
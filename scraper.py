@@ -1,85 +1,264 @@
-import requests
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
 import urllib.parse
+import hashlib
+import logging
+import re
+import threading
 import time
-import random
+from governor import RateGovernor, ScrapeError, BlockedError
+import stream_parser
+from download import Download, TransferStats
+from metrics import Metrics
+from ad import Ad
+
+logger = logging.getLogger(__name__)
+
+PARSERS = ("stream", "bs4")
+TRANSPORTS = ("live", "record", "replay")  # see transport.py
+
+# Used until the fake_useragent pool has been loaded in the background
+FALLBACK_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:128.0) Gecko/20100101 Firefox/128.0"
+
+_ADID_RE = re.compile(r'data-adid="(\d+)"')
+
+
+def page_fingerprint(html):
+    """Hash of the ordered ad ids on a result page, cheap enough to take before parsing."""
+    return hashlib.blake2b('\n'.join(_ADID_RE.findall(html)).encode('ascii'), digest_size=16).hexdigest()
+
+
+class ResultList(list):
+    """Ads of one result page, plus the page fingerprint."""
+    fingerprint = None
+    unchanged = False  # Fingerprint matched, the page was not parsed
+
+
+def ad_number(ad_id):
+    """Numeric value of an ad id, newer ads have higher ids. None if not numeric."""
+    try:
+        return int(ad_id)
+    except (TypeError, ValueError):
+        return None
 
 class KleinanzeigenScraper:
-    def __init__(self):
-        self.base_url = "https://www.kleinanzeigen.de"
-        self.ua = UserAgent()
-        self.session = requests.Session()
+    def __init__(self, request_delay=(1.0, 2.0), max_connections=10, parser="stream", streaming=True,
+                 warm_up=True, metrics=None, base_url="https://www.kleinanzeigen.de", transport="live",
+                 cassette_dir="cassettes"):
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser '{parser}', expected one of {PARSERS}")
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport '{transport}', expected one of {TRANSPORTS}")
+        self.base_url = base_url.rstrip("/")
+        # Record or replay answers instead of only talking to the site
+        self.transport = transport
+        self.cassette_dir = cassette_dir
+        self.parser = parser
+        # Stop downloading once the result list / description is complete (stream parser only)
+        self.streaming = streaming and parser == "stream"
+        self.transfer_stats = TransferStats()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.max_connections = max_connections
+        # requests and the UA pool are loaded on first use or in the background,
+        # neither is needed to show the window
+        self.ua = None
+        self._session = None
+        self._session_lock = threading.Lock()
+        # Every request goes through the governor
+        self.governor = RateGovernor(*request_delay)
+        if warm_up:
+            threading.Thread(target=self.warm_up, daemon=True).start()
+
+    def warm_up(self):
+        """Lädt requests und den User-Agent-Pool vorab, damit die erste Suche nicht wartet."""
+        self.session
+        if self.ua is None:
+            try:
+                from fake_useragent import UserAgent
+                self.ua = UserAgent()
+            except Exception as e:
+                logger.warning(f"Could not load user agents, using a fixed one: {e}")
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from transport import make_adapter
+                    session = requests.Session()
+                    # One pooled connection per worker thread
+                    adapter = make_adapter(self.transport, self.cassette_dir,
+                                           pool_connections=1, pool_maxsize=self.max_connections)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
 
     def get_headers(self):
         return {
-            "User-Agent": self.ua.random,
+            "User-Agent": self.ua.random if self.ua is not None else FALLBACK_USER_AGENT,
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
             "Accept-Language": "de,en-US;q=0.7,en;q=0.3",
-            "Referer": "https://www.kleinanzeigen.de/",
+            "Accept-Encoding": "gzip, deflate",
+            "Referer": self.base_url + "/",
             "Connection": "keep-alive",
             "Upgrade-Insecure-Requests": "1"
         }
 
-    def search(self, query, location=None, radius=None, category_id="0"):
+    def _download(self, url, kind, **kwargs):
         """
-        Führt eine Suche durch.
+        Öffnet die Antwort als Stream, der Body wird erst beim Lesen geladen.
+        Gibt (Download, 200) zurück, bei anderem Status (None, Status).
+        """
+        # Descriptions are only downloaded when the detail cache had none
+        cache = "miss" if kind == "detail" else None
+        started = time.perf_counter()
+        try:
+            response = self.governor.request(self.session, url, headers=self.get_headers(), stream=True, **kwargs)
+        except ScrapeError as e:
+            self.metrics.request(kind, url, e.status, time.perf_counter() - started, cache=cache)
+            raise
+        if kind == "search":
+            logger.info(f"Status Code: {response.status_code}")
+        if response.status_code != 200:
+            response.close()
+            self.transfer_stats.record(kind, 0)
+            self.metrics.request(kind, response.url, response.status_code, time.perf_counter() - started,
+                                 cache=cache)
+            return None, response.status_code
+        return Download(response, kind, self.transfer_stats, self.metrics, response.url, started, cache), 200
+
+    def search(self, query, location=None, radius=None, category_id="0", page=1, known_fingerprint=None):
+        """
+        Führt eine Suche durch, neueste Anzeigen zuerst.
+        Wirft ScrapeError (bzw. BlockedError), wenn die Anfrage fehlschlägt,
+        eine leere Liste bedeutet also wirklich "keine Ergebnisse".
+
+        Hat die Seite den Fingerprint known_fingerprint, wird sie nicht geparst
+        und eine leere Liste mit unchanged=True zurückgegeben. Im Streaming-Modus
+        wird nur bis zum Ende der Ergebnisliste geladen.
         """
         # Use the explicit search endpoint to avoid path issues
-        base_search_url = "https://www.kleinanzeigen.de/s-suchanfrage.html"
+        base_search_url = self.base_url + "/s-suchanfrage.html"
         
         params = {
             "keywords": query,
             "locationStr": location,
             "categoryId": category_id if category_id != "0" else "",
-            "radius": radius if radius and str(radius) != "0" else ""
+            "radius": radius if radius and str(radius) != "0" else "",
+            "sortingField": "SORTING_DATE",
+            "pageNum": page if page > 1 else ""
         }
         
         # Remove empty params
         params = {k: v for k, v in params.items() if v}
         
-        print(f"Scraping Search: {params}")
+        logger.info(f"Scraping Search: {params}")
         
+        download, status = self._download(base_search_url, "search", params=params)
+        if download is None:
+            raise ScrapeError(f"Search failed with HTTP {status}", status)
+
         try:
-            time.sleep(random.uniform(1, 3)) # Be nice
-            response = self.session.get(base_search_url, params=params, headers=self.get_headers())
-            print(f"Status Code: {response.status_code}")
-            # print(f"Final URL: {response.url}") # Debug
-            response.raise_for_status()
+            with download:
+                if self.streaming:
+                    # The rest of the page after the result list is never loaded
+                    html = stream_parser.read_result_list(download.chunks())
+                else:
+                    html = download.text()
+                fingerprint = page_fingerprint(html)
+                if known_fingerprint is not None:
+                    # Logged with the request, an unchanged page is a hit and never parsed
+                    download.cache = "hit" if fingerprint == known_fingerprint else "miss"
+
+            if fingerprint == known_fingerprint:
+                results = ResultList()
+                results.fingerprint = fingerprint
+                results.unchanged = True
+                logger.info("Result page unchanged.")
+                return results
             
-            results = self.parse_results(response.text)
-            print(f"Parsed {len(results)} results.")
+            results = ResultList(self.parse_results(html))
+            results.fingerprint = fingerprint
+            logger.info(f"Parsed {len(results)} results.")
             
             if len(results) == 0:
                 with open("debug_last_response.html", "w", encoding="utf-8") as f:
-                    f.write(response.text)
-                print("Saved HTML to debug_last_response.html")
+                    f.write(html)
+                logger.info("Saved HTML to debug_last_response.html")
                 
             return results
         except Exception as e:
-            print(f"Error scraping: {e}")
-            return []
+            raise ScrapeError(f"Could not read search results: {e}") from e
+
+    def search_pages(self, query, location=None, radius=None, category_id="0", watermark=None, max_pages=5,
+                     fingerprint=None):
+        """
+        Liefert die Ergebnisse Seite für Seite (neueste zuerst).
+
+        Hört nach der ersten Seite auf, die eine Anzeige enthält, die nicht
+        neuer als watermark ist. Ohne watermark wird nur die erste Seite geladen.
+        Ist die erste Seite unverändert (fingerprint), gibt es nichts Neues.
+        """
+        for page in range(1, max_pages + 1):
+            with self.metrics.time("search"):
+                results = self.search(query, location, radius, category_id, page=page,
+                                      known_fingerprint=fingerprint if page == 1 else None)
+            yield results
+            if not results or watermark is None:
+                return
+            numbers = [n for n in map(ad_number, (ad.id for ad in results)) if n is not None]
+            if not numbers or min(numbers) <= watermark:
+                return
 
     def get_ad_details(self, url):
         """
         Lädt die Detailseite einer Anzeige und gibt die Beschreibung zurück.
+        Ist die Anzeige gelöscht (404/410), ist die Beschreibung leer, andere
+        Fehler werfen ScrapeError.
         """
-        try:
-            time.sleep(random.uniform(0.5, 1.5)) # Delay to avoid blocking
-            response = self.session.get(url, headers=self.get_headers())
-            if response.status_code != 200:
-                return ""
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            desc_elem = soup.find('div', id='viewad-description-text')
-            if desc_elem:
-                return desc_elem.get_text().strip()
+        download, status = self._download(url, "detail")
+        if status in (404, 410):
             return ""
+        if download is None:
+            raise ScrapeError(f"Detail page {url} failed with HTTP {status}", status)
+        try:
+            with download:
+                if self.streaming:
+                    # Parsed while it downloads, the time counts to the request, not to "parse"
+                    return stream_parser.extract_description(download.chunks())
+                html = download.text()
         except Exception as e:
-            print(f"Error fetching details {url}: {e}")
-            return ""
+            raise ScrapeError(f"Could not read detail page {url}: {e}") from e
+        return self.parse_details(html)
+
+    def parse_details(self, html):
+        """
+        Extrahiert die Beschreibung aus einer Detailseite.
+        """
+        with self.metrics.time("parse"):
+            if self.parser == "stream":
+                return stream_parser.extract_description(html)
+            return self.parse_details_soup(html)
+
+    def parse_details_soup(self, html):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+        desc_elem = soup.find('div', id='viewad-description-text')
+        if desc_elem:
+            return desc_elem.get_text().strip()
+        return ""
 
     def parse_results(self, html):
+        with self.metrics.time("parse"):
+            if self.parser == "stream":
+                return list(stream_parser.iter_results(html, self.base_url))
+            return self.parse_results_soup(html)
+
+    def parse_results_soup(self, html):
+        """
+        Referenzimplementierung mit BeautifulSoup.
+        """
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, 'html.parser')
         results = []
         
@@ -112,14 +291,7 @@ class KleinanzeigenScraper:
                 img_elem = article.find('img')
                 image_url = img_elem.get('src') if img_elem else None
 
-                results.append({
-                    'id': ad_id,
-                    'title': title,
-                    'price': price,
-                    'link': link,
-                    'location': location,
-                    'image': image_url
-                })
+                results.append(Ad(ad_id, title, price, link, location, image_url))
             return results
 
         # Try Mobile/Alternative structure
@@ -154,14 +326,7 @@ class KleinanzeigenScraper:
                 img_elem = ad.find('img')
                 image_url = img_elem.get('src') if img_elem else None
 
-                results.append({
-                    'id': ad_id,
-                    'title': title,
-                    'price': price,
-                    'link': link,
-                    'location': location,
-                    'image': image_url
-                })
+                results.append(Ad(ad_id, title, price, link, location, image_url))
             return results
             
         return results
@@ -0,0 +1,125 @@
+import sqlite3
+import threading
+import time
+import zlib
+
+DAY = 24 * 3600
+
+
+def _today():
+    return int(time.time() // DAY)
+
+
+def ad_key(ad_id):
+    """Ad ids are numeric, keep them as integers. Anything else gets a stable negative hash."""
+    try:
+        return int(ad_id)
+    except (TypeError, ValueError):
+        return -zlib.crc32(str(ad_id).encode("utf-8")) - 1
+
+
+class SeenAdsStore:
+    """
+    Set of already reported ad ids, backed by SQLite in WAL mode.
+
+    Membership checks hit an in-memory set of integers, every new id is
+    committed right away so a crash does not lose it. Ids that have not shown
+    up in any result list for max_age_days are evicted. The set is filled in
+    a background thread, the first lookup waits for it.
+    """
+
+    def __init__(self, path="seen_ads.db", max_age_days=30):
+        self.path = path
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " ad_id INTEGER PRIMARY KEY,"
+            " last_seen INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS seen_age ON seen (last_seen)")
+        self._conn.commit()
+        self._loaded = threading.Event()
+        self.__ids = set()
+        if path == ":memory:":
+            self._load(self._conn)
+        else:
+            threading.Thread(target=self._load, daemon=True).start()
+
+    def _load(self, conn=None):
+        # A connection of its own, WAL lets it read while the main one writes
+        own = conn is None
+        try:
+            if own:
+                conn = sqlite3.connect(self.path)
+            self.__ids = {row[0] for row in conn.execute("SELECT ad_id FROM seen")}
+        finally:
+            if own and conn is not None:
+                conn.close()
+            self._loaded.set()
+
+    @property
+    def _ids(self):
+        self._loaded.wait()
+        return self.__ids
+
+    def __contains__(self, ad_id):
+        return ad_key(ad_id) in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, ad_id):
+        """Marks ad_id as seen. Returns True if it was not seen before."""
+        key = ad_key(ad_id)
+        if key in self._ids:
+            return False
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO seen (ad_id, last_seen) VALUES (?, ?)", (key, _today())
+            )
+            self._conn.commit()
+            self._ids.add(key)
+        # Another process may have claimed it in the meantime
+        return cur.rowcount == 1
+
+    def update(self, ad_ids):
+        """Bulk import without the per-id commit, used for migrating old configs."""
+        today = _today()
+        keys = [ad_key(ad_id) for ad_id in ad_ids]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen (ad_id, last_seen) VALUES (?, ?)", [(k, today) for k in keys]
+            )
+            self._conn.commit()
+            self._ids.update(keys)
+
+    def touch(self, ad_ids):
+        """Refreshes the age of ids that are still listed."""
+        today = _today()
+        keys = [(today, k, today) for k in map(ad_key, ad_ids) if k in self._ids]
+        if not keys:
+            return
+        with self._lock:
+            self._conn.executemany("UPDATE seen SET last_seen = ? WHERE ad_id = ? AND last_seen < ?", keys)
+            self._conn.commit()
+
+    def evict(self):
+        """Drops ids not seen for max_age_days, returns how many were removed."""
+        if not self.max_age_days:
+            return 0
+        cutoff = _today() - self.max_age_days
+        with self._lock:
+            old = [row[0] for row in self._conn.execute("SELECT ad_id FROM seen WHERE last_seen < ?", (cutoff,))]
+            if old:
+                self._conn.execute("DELETE FROM seen WHERE last_seen < ?", (cutoff,))
+                self._conn.commit()
+                self._ids.difference_update(old)
+        return len(old)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
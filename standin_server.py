@@ -0,0 +1,153 @@
+"""
+Local stand-in for kleinanzeigen.de, for load tests and recording cassettes.
+
+Serves generated search result pages (/s-suchanfrage.html) and detail pages
+(/s-anzeige/...) in the markup of fixtures.py. Every search (keywords,
+location, category) has its own list of ads, `churn` new ads per minute
+appear at the top of each list. Answers are delayed by `latency` seconds
+(+-50 %) and a share of `rate_limit` of them is answered with 429.
+
+    python standin_server.py --port 8080 --churn 2 --latency 0.2 --rate-limit 0.01
+
+and point the bot at it with "base_url": "http://127.0.0.1:8080" in config.json.
+"""
+import argparse
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fixtures
+
+PAGE_SIZE = 25
+_DETAIL_RE = re.compile(r'^/s-anzeige/[^/]+/(\d+)')
+
+
+class World:
+    """The ads of all searches, growing with time."""
+
+    def __init__(self, churn=1.0, pages=5, seed=0, clock=time.monotonic):
+        self.churn = churn  # New ads per search and minute
+        self.pages = pages  # Pages of ads a search has when it is first asked for
+        self.seed = seed
+        self.clock = clock
+        self.created = {}   # ad id -> clock time it appeared, None for the initial ones
+        self._lists = {}    # search -> [ids newest first, last update, fraction of an ad]
+        self._next_id = 3250000000
+        self._lock = threading.Lock()
+
+    def _new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def ids(self, search):
+        """Ids listed for search right now, newest first."""
+        with self._lock:
+            now = self.clock()
+            entry = self._lists.get(search)
+            if entry is None:
+                initial = [self._new_id() for _ in range(self.pages * PAGE_SIZE)]
+                for ad_id in initial:
+                    self.created[ad_id] = None
+                entry = self._lists[search] = [initial[::-1], now, 0.0]
+            due = entry[2] + (now - entry[1]) * self.churn / 60
+            new = [self._new_id() for _ in range(int(due))]
+            for ad_id in new:
+                self.created[ad_id] = now
+            entry[0][:0] = new[::-1]
+            del entry[0][self.pages * PAGE_SIZE * 2:]  # Old ads drop off the end
+            entry[1] = now
+            entry[2] = due - int(due)
+            return list(entry[0])
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = "Standin"
+
+    def _send(self, status, body="", headers=()):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+        url = urllib.parse.urlsplit(self.path)
+        if random.random() < server.rate_limit:
+            server.count("429")
+            self._send(429, "Too Many Requests", [("Retry-After", "1")])
+            return
+
+        detail = _DETAIL_RE.match(url.path)
+        if url.path == "/s-suchanfrage.html":
+            params = dict(urllib.parse.parse_qsl(url.query))
+            search = (params.get('keywords', ""), params.get('locationStr', ""), params.get('categoryId', ""))
+            page = int(params.get('pageNum') or 1)
+            ids = server.world.ids(search)[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+            server.count("search")
+            self._send(200, fixtures.results_page(ids, seed=server.world.seed))
+        elif detail:
+            server.count("detail")
+            self._send(200, fixtures.make_detail_page(int(detail.group(1)), seed=server.world.seed))
+        else:
+            server.count("404")
+            self._send(404, "Not Found")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, world=None, host="127.0.0.1", port=0, latency=0.0, rate_limit=0.0, handler=StandinHandler):
+        super().__init__((host, port), handler)
+        self.world = world if world is not None else World()
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.requests = {}  # kind -> answered requests
+        self._count_lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def count(self, kind):
+        with self._count_lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokaler Ersatz für kleinanzeigen.de")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--churn", type=float, default=1.0, help="New ads per search and minute")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per answer")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Share of answers that are 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = StandinServer(World(args.churn, seed=args.seed), args.host, args.port, args.latency, args.rate_limit)
+    print(f"Stand-in on {server.url}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
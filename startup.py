@@ -0,0 +1,48 @@
+"""
+Startup phase timing.
+
+Set KLEINANZEIGEN_STARTUP_TIMING=1 to print how long each phase took on
+stderr. The window is expected to show the searches within BUDGET seconds,
+anything slower is reported as a warning.
+"""
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+BUDGET = 1.0
+
+ENABLED = os.environ.get("KLEINANZEIGEN_STARTUP_TIMING", "") not in ("", "0")
+
+_start = time.perf_counter()
+_last = _start
+phases = []  # (name, seconds since the previous phase)
+
+
+def phase(name):
+    """Marks the end of a startup phase."""
+    global _last
+    now = time.perf_counter()
+    duration = now - _last
+    phases.append((name, duration))
+    _last = now
+    if ENABLED:
+        # sys.__stderr__, the GUI redirects sys.stderr into its console
+        print(f"[startup] {name}: {duration * 1000:.0f} ms", file=sys.__stderr__)
+
+
+def elapsed():
+    return time.perf_counter() - _start
+
+
+def interactive():
+    """Called once the window is up and responsive, reports the total."""
+    phase("interactive")
+    total = elapsed()
+    if ENABLED:
+        print(f"[startup] total: {total * 1000:.0f} ms (budget {BUDGET * 1000:.0f} ms)", file=sys.__stderr__)
+    if total > BUDGET:
+        logger.warning(f"Startup took {total:.2f}s, over the budget of {BUDGET:.1f}s")
+    return total
@@ -0,0 +1,344 @@
+"""
+Event driven parser for result and detail pages.
+
+Produces the same output as the BeautifulSoup implementation in scraper.py,
+but only looks at the handful of elements we need and never builds a tree.
+Input can be a complete page or an iterable of text chunks, parsing stops as
+soon as the result list (or the description) has been closed.
+"""
+import re
+from html.parser import HTMLParser
+
+from ad import Ad
+
+CHUNK_SIZE = 16 * 1024
+
+# Tags that cannot have children, html.parser never sends an end tag for them
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+])
+
+# Text inside these is not part of get_text() in BeautifulSoup
+HIDDEN_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+_LIST_START_RE = re.compile(r'<ul\b[^>]*\bid=["\'](?:srchrslt-adtable|srp-results)["\']', re.IGNORECASE)
+_LIST_TAG_RE = re.compile(r'<(/?)(ul|script)\b', re.IGNORECASE)
+_SCRIPT_END_RE = re.compile(r'</script', re.IGNORECASE)
+# A tag cut in two by a chunk boundary is looked at again with the next chunk
+_HOLD_BACK = 16
+_MAX_TAG = 256
+
+DESKTOP = 'desktop'
+MOBILE = 'mobile'
+
+
+def _has_class(attrs, name):
+    cls = attrs.get('class')
+    return cls is not None and name in cls.split()
+
+
+class _Capture:
+    """Collects the text of one element until it is closed."""
+    __slots__ = ('depth', 'chunks')
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.chunks = []
+
+    def text(self):
+        return ''.join(self.chunks).strip()
+
+
+class _StackParser(HTMLParser):
+    """Keeps track of open elements the same way BeautifulSoup's html.parser builder does."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.hidden = 0
+        self.captures = []
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = dict(attrs)
+        if tag in VOID_TAGS:
+            self.on_start(tag, attrs, len(self.stack) + 1)
+            return
+        self.stack.append(tag)
+        if tag in HIDDEN_TEXT_TAGS:
+            self.hidden += 1
+        self.on_start(tag, attrs, len(self.stack))
+
+    def handle_startendtag(self, tag, attrs):
+        # <tag/> opens and immediately closes an element
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.done or tag in VOID_TAGS:
+            return
+        # Unmatched end tags are ignored, matched ones close everything above them
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i] == tag:
+                break
+        else:
+            return
+        while len(self.stack) > i:
+            depth = len(self.stack)
+            closed = self.stack.pop()
+            if closed in HIDDEN_TEXT_TAGS:
+                self.hidden -= 1
+            while self.captures and self.captures[-1].depth == depth:
+                self.captures.pop()
+            self.on_end(closed, depth)
+            if self.done:
+                return
+
+    def handle_data(self, data):
+        if self.captures and not self.hidden:
+            for capture in self.captures:
+                capture.chunks.append(data)
+
+    def capture(self, depth):
+        capture = _Capture(depth)
+        self.captures.append(capture)
+        return capture
+
+    def on_start(self, tag, attrs, depth):
+        pass
+
+    def on_end(self, tag, depth):
+        pass
+
+
+class _ResultsParser(_StackParser):
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+        self.results = []
+        self.layout = None
+        self.list_depth = 0
+        self._reset_item()
+
+    def _reset_item(self):
+        self.item_depth = 0
+        self.item_id = None
+        self.item_href = None
+        self.article_depth = 0
+        self.article_seen = False
+        self.title_depth = 0
+        self.title_seen = False
+        self.title = None
+        self.link = None
+        self.price = None
+        self.location = None
+        self.image = None
+        self.image_seen = False
+
+    def on_start(self, tag, attrs, depth):
+        if not self.layout:
+            if tag == 'ul':
+                ul_id = attrs.get('id')
+                if ul_id == 'srchrslt-adtable':
+                    self.layout = DESKTOP
+                    self.list_depth = depth
+                elif ul_id == 'srp-results':
+                    self.layout = MOBILE
+                    self.list_depth = depth
+            return
+
+        if not self.item_depth:
+            if tag != 'li':
+                return
+            if self.layout == DESKTOP:
+                if _has_class(attrs, 'ad-listitem') and not _has_class(attrs, 'is-topad'):
+                    self.item_depth = depth
+            elif _has_class(attrs, 'adlist--item') and attrs.get('data-adid'):
+                self.item_depth = depth
+                self.item_id = attrs.get('data-adid')
+                self.item_href = attrs.get('data-href')
+            return
+
+        if self.layout == DESKTOP:
+            self._desktop_start(tag, attrs, depth)
+        else:
+            self._mobile_start(tag, attrs, depth)
+
+    def _desktop_start(self, tag, attrs, depth):
+        if not self.article_depth:
+            if tag == 'article' and not self.article_seen:
+                self.article_depth = depth
+                self.article_seen = True
+                self.item_id = attrs.get('data-adid')
+            return
+
+        if tag == 'a' and self.title is None and _has_class(attrs, 'ellipsis'):
+            self.title = self.capture(depth)
+            self.link = attrs.get('href')
+        elif tag == 'p' and self.price is None and _has_class(attrs, 'aditem-main--middle--price-shipping--price'):
+            self.price = self.capture(depth)
+        elif tag == 'div' and self.location is None and _has_class(attrs, 'aditem-main--top--left'):
+            self.location = self.capture(depth)
+        elif tag == 'img' and not self.image_seen:
+            self.image_seen = True
+            self.image = attrs.get('src')
+
+    def _mobile_start(self, tag, attrs, depth):
+        if tag == 'strong' and not self.title_seen and _has_class(attrs, 'adlist--item--boldtitle'):
+            self.title_seen = True
+            self.title_depth = depth
+        elif tag == 'a' and self.title_depth and self.title is None:
+            self.title = self.capture(depth)
+            self.link = attrs.get('href')
+        elif tag == 'div' and self.price is None and _has_class(attrs, 'adlist--item--price'):
+            self.price = self.capture(depth)
+        elif tag == 'div' and self.location is None and _has_class(attrs, 'adlist--item--info--location'):
+            self.location = self.capture(depth)
+        elif tag == 'img' and not self.image_seen:
+            self.image_seen = True
+            self.image = attrs.get('src')
+
+    def on_end(self, tag, depth):
+        if not self.layout:
+            return
+        if depth == self.list_depth:
+            self.done = True
+        elif depth == self.item_depth:
+            self._finish_item()
+            self._reset_item()
+        elif depth == self.article_depth:
+            self.article_depth = 0
+        elif depth == self.title_depth:
+            self.title_depth = 0
+
+    def _finish_item(self):
+        if self.layout == DESKTOP:
+            if not self.article_seen or self.title is None:
+                return
+            title = self.title.text()
+            link = self.base_url + self.link
+        elif self.title is not None:
+            title = self.title.text()
+            link = self.base_url + self.link
+        else:
+            link = self.base_url + self.item_href if self.item_href else ""
+            title = "Unbekannt"
+
+        self.results.append(Ad(
+            self.item_id,
+            title,
+            self.price.text() if self.price is not None else "VB",
+            link,
+            self.location.text() if self.location is not None else "",
+            self.image
+        ))
+
+
+class _DescriptionParser(_StackParser):
+
+    def __init__(self):
+        super().__init__()
+        self.description = None
+        self.desc_depth = 0
+
+    def on_start(self, tag, attrs, depth):
+        if self.description is None and tag == 'div' and attrs.get('id') == 'viewad-description-text':
+            self.description = self.capture(depth)
+            self.desc_depth = depth
+
+    def on_end(self, tag, depth):
+        if depth == self.desc_depth:
+            self.done = True
+
+
+def _chunks(source):
+    if isinstance(source, str):
+        for i in range(0, len(source), CHUNK_SIZE):
+            yield source[i:i + CHUNK_SIZE]
+    else:
+        yield from source
+
+
+def iter_results(source, base_url):
+    """
+    Yields one Ad per result, like KleinanzeigenScraper.parse_results.
+
+    The first result list in the document wins, a page is not expected to
+    contain both layouts.
+    """
+    parser = _ResultsParser(base_url)
+    for chunk in _chunks(source):
+        parser.feed(chunk)
+        if parser.results:
+            yield from parser.results
+            parser.results.clear()
+        if parser.done:
+            break
+    else:
+        parser.close()
+        yield from parser.results
+
+
+def read_result_list(source):
+    """
+    Reads chunks up to the end of the result list and returns the text read,
+    the whole page if it has no result list. Nothing is parsed, the end is
+    found by counting <ul> tags (outside of scripts), so a page can be
+    fingerprinted before it is decided whether parsing is needed.
+    """
+    text = ""
+    pos = 0
+    depth = 0
+    for chunk in _chunks(source):
+        text += chunk
+        if not depth:
+            match = _LIST_START_RE.search(text, pos)
+            if match is None:
+                pos = max(0, len(text) - _MAX_TAG)
+                continue
+            depth = 1
+            pos = match.end()
+        limit = len(text) - _HOLD_BACK
+        while True:
+            match = _LIST_TAG_RE.search(text, pos)
+            if match is None or match.start() >= limit:
+                pos = max(pos, limit)
+                break
+            if match.group(2).lower() == 'script':
+                if match.group(1):
+                    pos = match.end()
+                    continue
+                end = _SCRIPT_END_RE.search(text, match.end())
+                if end is None:
+                    pos = match.start()  # The rest of the script is still to come
+                    break
+                pos = end.end()
+                continue
+            pos = match.end()
+            depth += -1 if match.group(1) else 1
+            if not depth:
+                close = text.find('>', pos)
+                if close < 0:
+                    depth, pos = 1, match.start()
+                    break
+                return text[:close + 1]
+    return text
+
+
+def extract_description(source):
+    """Returns the text of div#viewad-description-text or "" if there is none."""
+    parser = _DescriptionParser()
+    for chunk in _chunks(source):
+        parser.feed(chunk)
+        if parser.done:
+            break
+    else:
+        parser.close()
+    if parser.description is None:
+        return ""
+    return parser.description.text()
@@ -0,0 +1,102 @@
+import copy
+import threading
+
+import pytest
+
+from cluster import ClusterWorker, Coordinator, CoordinatorServer, HashRing, RemoteSeenStore
+
+
+def test_ring_moves_few_keys_when_a_node_joins():
+    keys = [f"search-{i}" for i in range(1000)]
+    ring = HashRing(["a", "b", "c"])
+    before = {key: ring.node_for(key) for key in keys}
+    assert set(before.values()) == {"a", "b", "c"}
+    assert min(list(before.values()).count(node) for node in "abc") > 200
+
+    ring.add("d")
+    after = {key: ring.node_for(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    assert all(after[key] == "d" for key in moved)
+    assert 150 < len(moved) < 350
+
+
+@pytest.fixture
+def coordinator(mgr):
+    for i in range(20):
+        mgr.add_search(f"query {i}", "Berlin", 0)
+    coordinator = Coordinator(mgr, worker_timeout=60)
+    server = CoordinatorServer(coordinator, port=0)
+    server.start()
+    yield coordinator, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class FakeManager:
+    def __init__(self):
+        self.searches = []
+        self.searches_lock = threading.RLock()
+
+    def snapshot_searches(self):
+        return copy.deepcopy(self.searches)
+
+
+def test_searches_are_split_and_rebalanced(coordinator):
+    coordinator, url = coordinator
+    one = ClusterWorker(url, "one", FakeManager())
+    two = ClusterWorker(url, "two", FakeManager())
+    one.sync()
+    two.sync()
+    one.sync()
+    queries = lambda worker: {search['query'] for search in worker.manager.searches}
+    assert queries(one) and queries(two)
+    assert not queries(one) & queries(two)
+    assert len(queries(one) | queries(two)) == 20
+
+    # State learned by a worker survives the move to the other one
+    moved = one.manager.searches[0]
+    moved['watermark'] = 12345
+    moved['first_run'] = False
+    one.sync()
+    one.leave()
+    two.sync()
+    assert len(queries(two)) == 20
+    taken_over = next(s for s in two.manager.searches if s['query'] == moved['query'])
+    assert taken_over['watermark'] == 12345
+    assert taken_over['first_run'] is False
+
+
+def test_first_run_and_pending_stay_with_their_filters(mgr):
+    mgr.add_search("iphone", "Berlin", 0)
+    mgr.add_search("iphone", "Berlin", 0, filter_keywords=["pro"])
+    plain, pro = mgr.searches
+    coordinator = Coordinator(mgr)
+    worker = ClusterWorker("http://unused", "one", FakeManager())
+    worker.manager.searches = copy.deepcopy(mgr.searches)
+
+    # The worker seeded the search with filters, the other one is still new
+    seeded = worker.manager.searches[1]
+    seeded.update(first_run=False, pending=["3250000001"], watermark=3250000100)
+    worker.manager.searches[0]['watermark'] = 3250000100
+    coordinator.apply_states(worker.states())
+    assert (pro['first_run'], pro['pending']) == (False, ["3250000001"])
+    assert plain['first_run'] is True and 'pending' not in plain
+    assert plain['watermark'] == pro['watermark'] == 3250000100
+
+
+def test_each_ad_is_claimed_once(coordinator):
+    coordinator, url = coordinator
+    stores = [RemoteSeenStore(url) for _ in range(4)]
+    claimed = [[] for _ in stores]
+
+    def claim(i):
+        for ad_id in range(100):
+            if stores[i].add(str(ad_id)):
+                claimed[i].append(ad_id)
+
+    threads = [threading.Thread(target=claim, args=(i,)) for i in range(len(stores))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(ad_id for ids in claimed for ad_id in ids) == list(range(100))
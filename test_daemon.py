@@ -0,0 +1,94 @@
+import json
+import subprocess
+import sys
+import threading
+import urllib.request
+
+import pytest
+
+from daemon import ControlServer
+
+
+@pytest.fixture
+def api(mgr):
+    server = ControlServer(mgr, port=0)
+    server.start()
+
+    def call(method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}{path}",
+                                         data=data, method=method)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    yield mgr, call
+    server.shutdown()
+    server.server_close()
+
+
+def test_add_toggle_remove(api):
+    mgr, call = api
+    assert call("POST", "/searches", {"query": "iphone", "location": "Berlin", "radius": 10}) == (201, {'index': 0})
+    status, searches = call("GET", "/searches")
+    assert [(s['index'], s['query'], s['radius']) for s in searches] == [(0, "iphone", 10)]
+
+    assert call("POST", "/searches/0/toggle") == (200, {'notifications': False})
+    assert call("POST", "/searches", {"location": "Berlin"})[0] == 400
+    assert call("DELETE", "/searches/5")[0] == 404
+    assert call("DELETE", "/searches/0") == (200, {'removed': "iphone"})
+    assert mgr.searches == []
+    assert call("GET", "/status")[1]['searches'] == 0
+
+
+def test_concurrent_deletes_remove_one_search_each(api):
+    mgr, call = api
+    for i in range(3):
+        mgr.add_search(f"query {i}", "Berlin", 0)
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(call("DELETE", "/searches/0")[0]))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(answers) == [200] * 3 + [404] * 7
+    assert mgr.searches == []
+
+
+@pytest.mark.parametrize("body", [
+    {"query": 123},
+    {"query": "  "},
+    {"query": "iphone", "location": ["Berlin"]},
+    {"query": "iphone", "radius": 1.5},
+    {"query": "iphone", "filter_keywords": "pro"},
+    {"query": "iphone", "filter_keywords": ["pro", 2]},
+    {"query": "iphone", "notifications": "ja"},
+])
+def test_invalid_search_is_rejected(api, body):
+    mgr, call = api
+    assert call("POST", "/searches", body)[0] == 400
+    assert mgr.searches == []
+
+
+def test_daemon_does_not_import_tkinter():
+    code = "import sys, daemon; sys.exit('tkinter' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+def test_metrics_endpoint(api):
+    mgr, call = api
+    mgr.metrics.observe("search", 0.25)
+    assert call("GET", "/metrics?format=json")[1]['stages']['search']['count'] == 1
+
+    server = ControlServer(mgr, port=0)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            assert response.headers['Content-Type'].startswith("text/plain")
+            assert 'kleinanzeigen_stage_seconds_count{stage="search"} 1' in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,71 @@
+import random
+import string
+
+import pytest
+
+import detail_cache
+import fixtures
+from detail_cache import DetailCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(detail_cache.time, "time", clock)
+    return clock
+
+
+def _text(seed, length=2000):
+    """Hardly compressible, so every entry takes about the same space."""
+    rnd = random.Random(seed)
+    return "".join(rnd.choice(string.ascii_letters) for _ in range(length))
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = DetailCache(str(tmp_path / "details.db"), ttl=3600)
+    cache.put("3250000001", "Beschreibung")
+    clock.now += 3600
+    assert cache.get("3250000001") == "Beschreibung"
+    clock.now += 1
+    assert cache.get("3250000001") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A fresh fetch counts from now again
+    cache.put("3250000001", "Neu")
+    assert cache.get("3250000001") == "Neu"
+    cache.close()
+
+
+def test_oldest_entries_are_evicted(tmp_path, clock):
+    cache = DetailCache(str(tmp_path / "details.db"), max_bytes=8000)
+    cache.EVICT_EVERY = 1
+    for ad_id in range(10):
+        clock.now += 1
+        cache.put(ad_id, _text(ad_id))
+
+    kept = [ad_id for ad_id in range(10) if cache.get(ad_id) is not None]
+    total = cache._conn.execute("SELECT SUM(LENGTH(data)) FROM details").fetchone()[0]
+    assert total <= 8000
+    # Everything that is left is newer than everything that went
+    assert kept == list(range(10 - len(kept), 10)) and 0 < len(kept) < 10
+    cache.close()
+
+
+def test_cache_hit_skips_the_detail_request(mgr, monkeypatch):
+    (ad,) = mgr.scraper.parse_results(fixtures.make_results_page(1))
+    requests = []
+    monkeypatch.setattr(mgr.scraper, "get_ad_details", lambda url: requests.append(url) or "Beschreibung")
+
+    assert mgr.get_description(ad) == "Beschreibung"
+    assert mgr.get_description(ad) == "Beschreibung"
+    assert requests == [ad.link]
+    counts = {(c['kind'], c['cache']): c['count'] for c in mgr.metrics.snapshot()['request_counts']}
+    assert counts == {("detail", "hit"): 1}
@@ -0,0 +1,67 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import fixtures
+from scraper import KleinanzeigenScraper
+
+# Real detail pages carry a lot of markup and scripts after the description
+PADDING = "<script>" + "var x = 1;\n" * 20000 + "</script>"
+
+
+class DetailHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        ad_id = int(self.path.rsplit('/', 1)[-1])
+        page = fixtures.make_detail_page(ad_id)
+        if self.path.startswith('/big/'):
+            page = page.replace('</body>', PADDING + '</body>')
+        body = page.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            pass  # The client stopped reading
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), DetailHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_scraper(**kwargs):
+    scraper = KleinanzeigenScraper(request_delay=(0, 0), **kwargs)
+    scraper.governor.timeout = 5
+    return scraper
+
+
+def test_streamed_details_stop_after_the_description(server):
+    scraper = make_scraper()
+    full = make_scraper(parser="bs4")
+    assert scraper.get_ad_details(server + "/big/7") == full.get_ad_details(server + "/big/7")
+
+    stats = scraper.transfer_stats.snapshot()['detail']
+    assert stats['aborted'] == 1
+    assert stats['bytes'] < 64 * 1024
+    assert stats['saved'] > 100 * 1024
+    assert full.transfer_stats.snapshot()['detail']['aborted'] == 0
+
+
+def test_small_pages_are_read_to_the_end(server):
+    scraper = make_scraper()
+    assert scraper.get_ad_details(server + "/small/7")
+    stats = scraper.transfer_stats.snapshot()['detail']
+    assert stats['aborted'] == 0
+    assert stats['saved'] == 0
@@ -0,0 +1,98 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from governor import RateGovernor, ScrapeError, BlockedError, OPEN, HALF_OPEN
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers with the next status code of the server's script, 200 once it is used up."""
+
+    def do_GET(self):
+        script = self.server.script
+        status = script.pop(0) if script else 200
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(b"<html></html>")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    httpd.script = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def make_governor(**kwargs):
+    return RateGovernor(0, 0, max_backoff=0.05, failure_threshold=2, cooldown=60, **kwargs)
+
+
+def test_success_and_server_errors(server):
+    governor = make_governor()
+    session = requests.Session()
+    server.script = [503]
+    with pytest.raises(ScrapeError) as info:
+        governor.request(session, url(server))
+    assert not isinstance(info.value, BlockedError)
+    assert info.value.status == 503
+    assert governor.stats()['backoff'] > 0
+
+    assert governor.request(session, url(server)).status_code == 200
+    stats = governor.stats()
+    assert stats['statuses'] == {503: 1, 200: 1}
+    assert stats['requests_per_minute'] == 2
+    assert stats['state'] == "ok"
+
+
+def test_blocking_opens_the_circuit(server):
+    governor = make_governor()
+    session = requests.Session()
+    server.script = [429, 403]
+    for _ in range(2):
+        with pytest.raises(BlockedError):
+            governor.request(session, url(server))
+    assert governor.stats()['state'] == OPEN
+
+    # Paused: the server is not asked at all
+    with pytest.raises(BlockedError):
+        governor.request(session, url(server))
+    assert sum(governor.stats()['statuses'].values()) == 2
+    assert "pausiert" in governor.summary()
+
+
+def test_network_errors_raise_scrape_error():
+    governor = make_governor(timeout=1)
+    with pytest.raises(ScrapeError):
+        governor.request(requests.Session(), "http://127.0.0.1:9/")
+
+
+def test_failed_probe_closes_for_any_exception(server):
+    governor = RateGovernor(0, 0, max_backoff=0.01, failure_threshold=1, cooldown=0.01)
+    server.script = [429]
+    with pytest.raises(BlockedError):
+        governor.request(requests.Session(), url(server))
+
+    class BrokenSession:
+        def request(self, method, url, **kwargs):
+            raise ValueError("corrupt cassette")
+    time.sleep(0.05)
+    with pytest.raises(ValueError):
+        governor.request(BrokenSession(), url(server))
+    assert governor.stats()["state"] != HALF_OPEN
+    time.sleep(0.05)
+    assert governor.request(requests.Session(), url(server)).status_code == 200
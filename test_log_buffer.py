@@ -0,0 +1,49 @@
+import logging
+
+from log_buffer import LogBuffer, StreamToLogger
+
+
+def make_logger(capacity):
+    buffer = LogBuffer(capacity)
+    buffer.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    logger = logging.getLogger(f"test_log_buffer.{capacity}")
+    logger.propagate = False
+    logger.handlers = [buffer]
+    logger.setLevel(logging.INFO)
+    return buffer, logger
+
+
+def test_only_the_last_lines_are_kept():
+    buffer, logger = make_logger(100)
+    for i in range(1000):
+        logger.info(f"line {i}")
+    seq, lines = buffer.lines()
+    assert seq == 1000
+    assert len(lines) == 100
+    assert lines[0] == (logging.INFO, "INFO line 900")
+
+
+def test_reader_gets_batches_and_repeats_are_folded():
+    buffer, logger = make_logger(100)
+    logger.info("scan")
+    logger.warning("blocked")
+    seq, replace_last, lines = buffer.since(0)
+    assert not replace_last
+    assert lines == [(logging.INFO, "INFO scan"), (logging.WARNING, "WARNING blocked")]
+
+    logger.warning("blocked")
+    logger.warning("blocked")
+    seq, replace_last, lines = buffer.since(seq)
+    assert replace_last
+    assert lines == [(logging.WARNING, "WARNING blocked (x3)")]
+    assert len(buffer) == 2
+
+    assert buffer.since(seq) == (seq, False, [])
+
+
+def test_prints_become_records():
+    buffer, logger = make_logger(10)
+    stream = StreamToLogger(logger, logging.ERROR)
+    stream.write("Traceback\n  line")
+    stream.write(" 1\n")
+    assert buffer.lines()[1] == [(logging.ERROR, "ERROR Traceback"), (logging.ERROR, "ERROR   line 1")]
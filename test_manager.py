@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+
+import fixtures
+import manager
+from planner import plan_cycle
+from scraper import ResultList, ScrapeError
+from standin_server import PAGE_SIZE
+
+
+def test_save_config_while_searches_change(mgr):
+    mgr.add_search("iphone", "Berlin", 0)
+    stop = threading.Event()
+
+    def edit():
+        # Every edit changes the rule, so keys are popped and added again
+        i = 0
+        while not stop.is_set():
+            i += 1
+            mgr.edit_search(0, "iphone", "Berlin", 0, filter_keywords=[str(i % 2)])
+            with mgr.searches_lock:
+                mgr.searches[0].update(watermark=i, rate=0.1, pending=["1"])
+
+    thread = threading.Thread(target=edit)
+    thread.start()
+    try:
+        for _ in range(2000):
+            mgr.save_config()
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_reload_keeps_hand_edits_and_scan_state(mgr):
+    mgr.writer.delay = mgr.writer.max_delay = 60
+    mgr.add_search("iphone", "Berlin", 0)
+    mgr.add_search("ipad", "Berlin", 0)
+    mgr.writer.flush()
+
+    # Scan state that is not on disk yet
+    with mgr.searches_lock:
+        mgr.searches[0].update(first_run=False, watermark=100)
+        mgr.searches[1].update(first_run=False, watermark=200)
+    mgr.save_config()
+
+    with open(manager.CONFIG_FILE) as f:
+        data = json.load(f)
+    data['interval'] = 900
+    data['searches'][1]['filter_keywords'] = ["air"]  # new definition, starts over
+    data['searches'].append({'query': "macbook", 'location': "Berlin", 'radius': 0})
+    with open(manager.CONFIG_FILE, 'w') as f:
+        json.dump(data, f)
+
+    mgr.reload_config()
+    mgr.writer.flush()
+    assert mgr.interval == 900
+    iphone, ipad, macbook = mgr.searches
+    assert (iphone['watermark'], iphone['first_run']) == (100, False)
+    assert ipad['filter_keywords'] == ["air"] and ipad['first_run'] and 'watermark' not in ipad
+    assert macbook['first_run']
+    with open(manager.CONFIG_FILE) as f:
+        assert json.load(f)['searches'] == mgr.searches
+
+
+def _counting(monkeypatch, obj, name):
+    """Wraps obj.name, returns the list of first arguments it is called with."""
+    calls = []
+    original = getattr(obj, name)
+
+    def wrapper(arg, *args, **kwargs):
+        calls.append(arg)
+        return original(arg, *args, **kwargs)
+    monkeypatch.setattr(obj, name, wrapper)
+    return calls
+
+
+def _pass(mgr):
+    mgr.compile_matcher(mgr.searches)
+    (group,) = plan_cycle(mgr.searches)
+    return mgr._process_group(group)
+
+
+def test_unchanged_page_skips_parsing_and_matching(mgr, standin, monkeypatch):
+    mgr.add_search("zzz", "Berlin", 0)
+    mgr.running = True
+    parsed = _counting(monkeypatch, mgr.scraper, "parse_results")
+    scanned = _counting(monkeypatch, mgr, "scan_title")
+
+    assert _pass(mgr) == (None, 1)
+    assert len(parsed) == 1 and len(scanned) == PAGE_SIZE
+    assert mgr.fingerprint_stats == {'hits': 0, 'misses': 1, 'skipped_ads': 0}
+
+    # Same page again: only fetched, nothing parsed, matched or fetched in detail
+    assert _pass(mgr) == (0, 1)
+    assert len(parsed) == 1 and len(scanned) == PAGE_SIZE
+    assert standin.requests == {'search': 2}
+    assert mgr.fingerprint_stats == {'hits': 1, 'misses': 1, 'skipped_ads': PAGE_SIZE}
+
+
+def test_changed_page_evaluates_only_new_ads(mgr, standin, monkeypatch):
+    mgr.add_search("zzz", "Berlin", 0)
+    mgr.running = True
+    _pass(mgr)
+    first_page = set(standin.world.ids(("zzz", "Berlin", ""))[:PAGE_SIZE])
+
+    standin.world.clock.now += 60
+    scanned = _counting(monkeypatch, mgr, "scan_title")
+    new_ads, requests = _pass(mgr)
+    (new_id,) = set(standin.world.ids(("zzz", "Berlin", ""))[:PAGE_SIZE]) - first_page
+    assert new_ads == 1
+    assert [ad.id for ad in scanned] == [str(new_id)]
+    # The new ad is undecided from its title and needs its description
+    assert requests == 2 and standin.requests['detail'] == 1
+    assert mgr.fingerprint_stats == {'hits': 0, 'misses': 2, 'skipped_ads': PAGE_SIZE - 1}
+
+
+def test_edited_rules_force_a_full_pass(mgr, standin, monkeypatch):
+    mgr.add_search("zzz", "Berlin", 0)
+    mgr.running = True
+    _pass(mgr)
+    assert _pass(mgr) == (0, 1)
+
+    mgr.edit_search(0, "zzz", "Berlin", 0, filter_keywords=["pro"])
+    scanned = _counting(monkeypatch, mgr, "scan_title")
+    assert _pass(mgr) == (None, 1)
+    assert len(scanned) == PAGE_SIZE
+    assert mgr.fingerprint_stats == {'hits': 1, 'misses': 2, 'skipped_ads': PAGE_SIZE}
+
+
+def test_watermark_follows_the_evaluated_ads(mgr, standin):
+    mgr.add_search("zzz", "Berlin", 0)
+    mgr.running = True
+    _pass(mgr)
+    search = mgr.searches[0]
+    listed = standin.world.ids(("zzz", "Berlin", ""))
+    assert search['watermark'] == listed[0]
+
+    # 30 new ads push the old ones to page 2, which is loaded as well
+    standin.world.clock.now += 30 * 60
+    new_ads, requests = _pass(mgr)
+    listed = standin.world.ids(("zzz", "Berlin", ""))
+    assert new_ads == 30 and standin.requests['search'] == 3
+    assert search['watermark'] == listed[0]
+
+
+def test_stopped_pass_keeps_the_watermark(mgr, standin, monkeypatch):
+    mgr.add_search("zzz", "Berlin", 0)
+    mgr.running = True
+    _pass(mgr)
+    search = mgr.searches[0]
+    watermark = search['watermark']
+
+    # Stopped while matching, before the descriptions of the new ads are fetched
+    standin.world.clock.now += 2 * 60
+    scan_title = mgr.scan_title
+    monkeypatch.setattr(mgr, "scan_title", lambda ad: setattr(mgr, "running", False) or scan_title(ad))
+    assert _pass(mgr) == (2, 1)
+    assert search['watermark'] == watermark and standin.requests.get('detail', 0) == 0
+
+    # The next pass still sees them as new
+    monkeypatch.setattr(mgr, "scan_title", scan_title)
+    mgr.running = True
+    assert _pass(mgr) == (2, 3)
+    assert search['watermark'] == standin.world.ids(("zzz", "Berlin", ""))[0]
+
+
+def test_failed_description_leaves_only_that_ad_undecided(mgr, monkeypatch):
+    page = ResultList(mgr.scraper.parse_results(fixtures.make_results_page(5)))
+    monkeypatch.setattr(mgr.scraper, "search_pages", lambda *args, **kwargs: iter([page]))
+    broken = [page[2].link]
+
+    def get_ad_details(url):
+        if url in broken:
+            raise ScrapeError("HTTP 500", 500)
+        return "zzz"
+    monkeypatch.setattr(mgr.scraper, "get_ad_details", get_ad_details)
+    notified = []
+    mgr.notify_new_ad = lambda ad, search="": notified.append(ad.id)
+    mgr.add_search("zzz", "", 0)
+    mgr.searches[0]['first_run'] = False
+    mgr.running = True
+
+    # The other four ads are decided and notified, the page is not remembered
+    assert _pass(mgr) == (None, 6)
+    assert sorted(notified) == sorted(ad.id for ad in page if ad.link not in broken)
+    assert 'watermark' not in mgr.searches[0]
+
+    # The next pass only asks for the failed description again
+    broken.clear()
+    assert _pass(mgr) == (None, 2)
+    assert sorted(notified) == sorted(ad.id for ad in page)
+    assert mgr.searches[0]['watermark']
+
+
+def test_failing_cycle_does_not_end_monitoring(mgr, caplog):
+    # Hand edited into config.json, matching it fails
+    mgr.searches.append({'query': 123, 'location': "", 'radius': 0, 'first_run': True})
+    mgr.start_monitoring()
+    try:
+        time.sleep(1.5)
+        assert mgr.thread.is_alive()
+        assert "Cycle failed" in caplog.text
+    finally:
+        mgr.stop_monitoring()
+        mgr.thread.join()
@@ -0,0 +1,54 @@
+import random
+
+from ad import normalize
+from matcher import KeywordMatcher, rule_for
+
+
+def naive(query, filters, title, desc):
+    # Reference: the original per-search check of the monitor loop
+    if query.lower() not in title.lower() and query.lower() not in desc.lower():
+        return False
+    if filters:
+        return any(k.lower() in title.lower() for k in filters) or any(k.lower() in desc.lower() for k in filters)
+    return True
+
+
+def test_same_verdicts_as_substring_checks():
+    rnd = random.Random(1)
+    words = ["iphone", "13", "pro", "phone", "hone", "max", "fahrrad", "rad", "damen", "28"]
+    searches = [{'query': " ".join(rnd.sample(words, rnd.randint(1, 2))),
+                 'filter_keywords': rnd.sample(words, rnd.randint(0, 3))} for _ in range(40)]
+    matcher = KeywordMatcher({rule_for(s) for s in searches})
+
+    for _ in range(200):
+        title = " ".join(rnd.choices(words, k=4))
+        desc = " ".join(rnd.choices(words, k=12))
+        title_hits = matcher.scan(normalize(title))
+        desc_hits = matcher.scan(normalize(desc))
+        for search in searches:
+            rule = rule_for(search)
+            verdict = matcher.decide(rule, title_hits)
+            if verdict is None:
+                verdict = matcher.decide(rule, title_hits, desc_hits)
+            assert verdict == naive(search['query'], search['filter_keywords'], title, desc)
+
+
+def test_umlaut_folding():
+    matcher = KeywordMatcher([rule_for({'query': "Rasenmäher", 'filter_keywords': ["Straße"]})])
+    rule = next(iter(matcher.rules))
+    assert matcher.decide(rule, matcher.scan(normalize("RASENMAEHER Strasse")))
+
+
+def test_whole_words():
+    matcher = KeywordMatcher([rule_for({'query': "rad"})], whole_words=True)
+    rule = next(iter(matcher.rules))
+    assert matcher.decide(rule, matcher.scan("fahrrad 28 zoll"), frozenset()) is False
+    assert matcher.decide(rule, matcher.scan("rad, 28 zoll"))
+
+
+def test_description_needed_only_when_title_is_not_enough():
+    matcher = KeywordMatcher([rule_for({'query': "iphone", 'filter_keywords': ["pro", ""]})])
+    rule = next(iter(matcher.rules))
+    # The empty keyword (trailing comma in the GUI) always matches
+    assert matcher.decide(rule, matcher.scan("iphone 13"))
+    assert matcher.decide(rule, matcher.scan("handy")) is None
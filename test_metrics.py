@@ -0,0 +1,45 @@
+import json
+
+from metrics import Histogram, Metrics, RequestLog
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [(0.1, 1), (1.0, 3), ('+Inf', 4)]
+    assert histogram.count == 4 and abs(histogram.sum - 6.25) < 1e-9
+
+
+def test_cycle_summary_and_exports(tmp_path):
+    metrics = Metrics()
+    metrics.observe("search", 0.2)
+    metrics.start_cycle()
+    metrics.observe("search", 1.5)
+    metrics.observe("match", 0.01)
+    metrics.observe("search", 0.5)
+    assert metrics.end_cycle() == {"search": (2, 2.0), "match": (1, 0.01)}
+    assert metrics.cycle_summary() == "search 2.00 s (2x), match 0.01 s (1x)"
+
+    metrics.request("detail", "https://example.org/1", 200, 0.3, 1000, cache="miss")
+    metrics.request("detail", "https://example.org/2", None, 0.0, cache="hit")
+    text = metrics.to_prometheus()
+    assert 'kleinanzeigen_stage_seconds_count{stage="search"} 3' in text
+    assert 'kleinanzeigen_requests_total{kind="detail",status="200",cache="miss"} 1' in text
+    assert 'kleinanzeigen_bytes_total{kind="detail"} 1000' in text
+    snapshot = metrics.snapshot()
+    assert snapshot['requests']['detail']['count'] == 2
+    assert json.dumps(snapshot)
+
+
+def test_request_log_rotates(tmp_path):
+    path = tmp_path / "http_requests.jsonl"
+    metrics = Metrics(RequestLog(str(path), max_bytes=500, backups=2))
+    for i in range(20):
+        metrics.request("search", f"https://example.org/s?page={i}", 200, 0.1, 2048)
+    metrics.request_log.close()
+
+    record = json.loads(path.read_text(encoding='utf-8').splitlines()[-1])
+    assert record['url'].endswith("page=19") and record['status'] == 200 and record['bytes'] == 2048
+    assert (tmp_path / "http_requests.jsonl.1").exists()
+    assert not (tmp_path / "http_requests.jsonl.3").exists()
@@ -0,0 +1,53 @@
+import json
+import time
+
+from ad import Ad
+from notifier import FileSink, NotificationDispatcher, make_sink
+
+
+def make_ad(i):
+    return Ad(str(i), f"Fahrrad {i}", f"{i} €", f"/s-anzeige/{i}", "10115 Berlin", "")
+
+
+def test_bursts_become_digests(tmp_path):
+    path = tmp_path / "notifications.log"
+    dispatcher = NotificationDispatcher([make_sink(f"file:{path}")], digest_threshold=3, coalesce=0.5)
+    for i in range(5):
+        assert dispatcher.submit(make_ad(i), "fahrrad")
+    dispatcher.submit(make_ad(9), "roller")
+    dispatcher.close()
+
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [(r['search'], len(r['ads'])) for r in records] == [("fahrrad", 5), ("roller", 1)]
+    assert records[0]['title'].startswith("5 neue Angebote")
+    assert dispatcher.sent == 2 and dispatcher.failed == 0
+
+
+def test_rate_limit_folds_the_rest_into_one_digest():
+    sent = []
+    dispatcher = NotificationDispatcher([sent.append], max_per_window=2, coalesce=0.5)
+    for i, search in enumerate(["a", "b", "c", "d"]):
+        dispatcher.submit(make_ad(i), search)
+    dispatcher.close()
+    assert [(n.search, len(n.ads)) for n in sent] == [("a", 1), ("b, c, d", 3)]
+
+
+def test_submit_never_blocks():
+    def slow(notification):
+        time.sleep(0.2)
+
+    dispatcher = NotificationDispatcher([slow], max_queue=2, coalesce=0)
+    start = time.monotonic()
+    accepted = [dispatcher.submit(make_ad(i), "x") for i in range(20)]
+    assert time.monotonic() - start < 0.1
+    assert not all(accepted) and dispatcher.dropped == accepted.count(False)
+    dispatcher.close()
+
+
+def test_failing_sink_does_not_stop_the_others(tmp_path):
+    path = tmp_path / "out.log"
+    dispatcher = NotificationDispatcher([make_sink("http://127.0.0.1:1/hook"), FileSink(str(path))], coalesce=0)
+    dispatcher.submit(make_ad(1), "x")
+    dispatcher.close()
+    assert dispatcher.failed == 1
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 1
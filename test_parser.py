@@ -0,0 +1,124 @@
+import pytest
+
+import fixtures
+import stream_parser
+from scraper import KleinanzeigenScraper, page_fingerprint
+from standin_server import PAGE_SIZE, StandinServer, World
+
+
+@pytest.fixture
+def scraper():
+    return KleinanzeigenScraper()
+
+
+def test_recorded_page(scraper):
+    with open(fixtures.RECORDED_PAGE, encoding="utf-8") as f:
+        html = f.read()
+    assert list(stream_parser.iter_results(html, scraper.base_url)) == scraper.parse_results_soup(html)
+
+
+@pytest.mark.parametrize("layout", ["desktop", "mobile"])
+@pytest.mark.parametrize("count", [0, 1, 25, 100])
+def test_synthetic_pages(scraper, layout, count):
+    html = fixtures.make_results_page(count, layout, seed=count)
+    expected = scraper.parse_results_soup(html)
+    assert len(expected) == count
+    assert list(stream_parser.iter_results(html, scraper.base_url)) == expected
+
+
+def test_chunked_input(scraper):
+    html = fixtures.make_results_page(25, "desktop")
+    chunks = [html[i:i + 7] for i in range(0, len(html), 7)]
+    assert list(stream_parser.iter_results(chunks, scraper.base_url)) == scraper.parse_results_soup(html)
+
+
+def test_stops_after_result_list(scraper):
+    html = fixtures.make_results_page(3, "mobile") + "<ul id='srp-results'><li class='adlist--item' data-adid='9'>"
+    assert [ad['id'] for ad in stream_parser.iter_results(html, scraper.base_url)] == \
+        [ad['id'] for ad in scraper.parse_results_soup(html)]
+
+
+def test_description(scraper):
+    html = fixtures.make_detail_page(3250000001)
+    expected = scraper.parse_details_soup(html)
+    assert expected
+    assert stream_parser.extract_description(html) == expected
+    assert stream_parser.extract_description(fixtures.HEAD) == scraper.parse_details_soup(fixtures.HEAD) == ""
+
+
+def test_hidden_text_and_entities(scraper):
+    html = ('<div id="viewad-description-text">a<script>s</script><template>t</template>'
+            '<ruby>r<rt>q</rt></ruby><!--c--> &amp; &nbsp;b<br/>c<p>unclosed</div>')
+    assert stream_parser.extract_description(html) == scraper.parse_details_soup(html)
+
+
+@pytest.mark.parametrize("layout", ["desktop", "mobile"])
+def test_read_result_list_stops_at_the_end_of_the_list(scraper, layout):
+    html = fixtures.make_results_page(25, layout)
+    chunks = [html[i:i + 7] for i in range(0, len(html), 7)]
+    text = stream_parser.read_result_list(iter(chunks))
+    assert text.endswith("</ul>") and len(text) < len(html)
+    assert "site-footer" not in text
+    assert page_fingerprint(text) == page_fingerprint(html)
+    assert list(stream_parser.iter_results(text, scraper.base_url)) == scraper.parse_results_soup(html)
+
+
+def test_read_result_list_without_list():
+    html = fixtures.HEAD + "<script>var x = '<ul id=\"srp-results\">';</script>" + fixtures.TAIL
+    assert stream_parser.read_result_list(html) == html
+
+
+@pytest.fixture
+def standin_scraper():
+    server = StandinServer(World(churn=0))
+    server.start()
+    yield KleinanzeigenScraper((0, 0), warm_up=False, base_url=server.url), server
+    server.shutdown()
+    server.server_close()
+
+
+def test_unchanged_page_is_not_parsed(standin_scraper, monkeypatch):
+    scraper, _ = standin_scraper
+    first = scraper.search("fahrrad")
+    assert len(first) == 25 and not first.unchanged
+
+    def fail(html):
+        raise AssertionError("parsed an unchanged page")
+    monkeypatch.setattr(scraper, "parse_results", fail)
+    second = scraper.search("fahrrad", known_fingerprint=first.fingerprint)
+    assert second.unchanged and second.fingerprint == first.fingerprint and not second
+    counts = {(c['kind'], c['cache']): c['count'] for c in scraper.metrics.snapshot()['request_counts']}
+    assert counts == {("search", None): 1, ("search", "hit"): 1}
+
+
+def _paged(scraper, monkeypatch, **kwargs):
+    """Ids per page search_pages yields, plus the URLs it requested."""
+    urls = []
+    record = scraper.metrics.request
+    monkeypatch.setattr(scraper.metrics, "request",
+                        lambda kind, url, *args, **kw: urls.append(url) or record(kind, url, *args, **kw))
+    pages = [[int(ad.id) for ad in page] for page in scraper.search_pages("fahrrad", **kwargs)]
+    return pages, urls
+
+
+def test_paging_stops_at_the_watermark(standin_scraper, monkeypatch):
+    scraper, server = standin_scraper
+    listed = server.world.ids(("fahrrad", "", ""))
+
+    # Without a watermark only the first page is loaded
+    pages, urls = _paged(scraper, monkeypatch)
+    assert pages == [listed[:PAGE_SIZE]]
+    assert "pageNum" not in urls[0]
+
+    # The first page holding an ad up to the watermark is the last one
+    pages, urls = _paged(scraper, monkeypatch, watermark=listed[2 * PAGE_SIZE + 3])
+    assert pages == [listed[:PAGE_SIZE], listed[PAGE_SIZE:2 * PAGE_SIZE], listed[2 * PAGE_SIZE:3 * PAGE_SIZE]]
+    assert "pageNum" not in urls[-3] and "pageNum=2" in urls[-2] and "pageNum=3" in urls[-1]
+
+
+def test_paging_stops_at_max_pages(standin_scraper, monkeypatch):
+    scraper, server = standin_scraper
+    listed = server.world.ids(("fahrrad", "", ""))
+    pages, _ = _paged(scraper, monkeypatch, watermark=0, max_pages=2)
+    assert pages == [listed[:PAGE_SIZE], listed[PAGE_SIZE:2 * PAGE_SIZE]]
+    assert server.requests == {'search': 2}
@@ -0,0 +1,42 @@
+import json
+import time
+
+from persistence import ConfigWriter
+
+
+def test_writes_are_coalesced(tmp_path):
+    path = str(tmp_path / "config.json")
+    writer = ConfigWriter(path, delay=0.1)
+    for i in range(20):
+        writer.update('searches', [{'query': 'iphone', 'radius': i}])
+    writer.update(None, {'interval': 300})
+    time.sleep(0.5)
+
+    assert writer.writes == 1
+    with open(path) as f:
+        assert json.load(f) == {'searches': [{'query': 'iphone', 'radius': 19}], 'interval': 300}
+    writer.close()
+
+
+def test_unchanged_sections_are_not_written(tmp_path):
+    writer = ConfigWriter(str(tmp_path / "config.json"), delay=60)
+    writer.update(None, {'interval': 300})
+    assert writer.flush() > 0
+    writer.update(None, {'interval': 300})
+    assert not writer.is_dirty()
+    assert writer.flush() == 0
+    assert not (tmp_path / "config.json.tmp").exists()
+    writer.close()
+
+
+def test_discard_pending_keeps_a_hand_edit(tmp_path):
+    path = tmp_path / "config.json"
+    writer = ConfigWriter(str(path), delay=60)
+    writer.update(None, {'interval': 300})
+    writer.flush()
+    writer.update(None, {'interval': 600})
+    with writer.discard_pending():
+        path.write_text(json.dumps({'interval': 900}))
+    assert not writer.is_dirty()
+    writer.close()
+    assert json.loads(path.read_text()) == {'interval': 900}
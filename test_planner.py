@@ -0,0 +1,21 @@
+from planner import plan_cycle
+
+
+def make_search(query, radius=0, **kwargs):
+    return dict({'query': query, 'location': "Berlin", 'radius': radius, 'category_id': "0"}, **kwargs)
+
+
+def test_identical_requests_share_a_fetch():
+    searches = [
+        make_search("iphone"),
+        make_search("iphone", "0", filter_keywords=["pro"]),
+        make_search("iphone", 10),
+        make_search("ipad"),
+    ]
+    groups = plan_cycle(searches)
+    assert [g.key for g in groups] == [
+        ("iphone", "Berlin", "0", "0"),
+        ("iphone", "Berlin", "10", "0"),
+        ("ipad", "Berlin", "0", "0"),
+    ]
+    assert groups[0].searches == searches[:2]
@@ -0,0 +1,50 @@
+from ad import Ad
+from result_store import ResultStore
+
+
+def make_ad(ad_id, price="100 €", location="10115 Mitte (5 km)"):
+    return Ad(str(ad_id), f"Ad {ad_id}", price, "", location, None)
+
+
+def test_ad_fields():
+    ad = Ad("1", "iPhone 13 Mini", "1.200 € VB", "", "10115 Mitte\n   (12 km)", None)
+    assert ad.price_value == 1200
+    assert ad.negotiable
+    assert ad.distance_km == 12
+    assert ad.postcode == "10115"
+    assert ad.title_norm == "iphone 13 mini"
+    assert ad['title'] == ad.title
+    assert make_ad(2, "12,50 €", "Berlin").price_value == 12.5
+    assert make_ad(3, "VB", "Berlin").distance_km is None
+
+
+def test_dedup_and_sources():
+    store = ResultStore()
+    assert store.add(make_ad(1), "a")
+    assert not store.add(make_ad(1), "b")
+    assert len(store) == 1
+    assert store.sources("1") == {"a", "b"}
+    assert [ad['id'] for ad in store.by_search("b")] == ["1"]
+
+
+def test_indexes_and_eviction():
+    store = ResultStore(max_size=3)
+    store.add(make_ad(1, "300 €", "(30 km)"), "a")
+    store.add(make_ad(2, "VB", "Berlin"), "a")
+    store.add(make_ad(3, "100 €", "(10 km)"), "b")
+    store.add(make_ad(4, "200 €", "(20 km)"), "b")
+
+    assert [ad['id'] for ad in store.snapshot()] == ["2", "3", "4"]
+    assert [ad['id'] for ad in store.sorted_by_price()] == ["3", "4", "2"]
+    assert [ad['id'] for ad in store.sorted_by_price(150, 250)] == ["4"]
+    assert [ad['id'] for ad in store.sorted_by_distance(max_km=15)] == ["3"]
+    assert store.by_search("a")[0]['id'] == "2"
+
+
+def test_snapshot_is_stable():
+    store = ResultStore()
+    store.add(make_ad(1))
+    snap = store.snapshot()
+    store.add(make_ad(2))
+    assert len(snap) == 1
+    assert len(store.snapshot()) == 2
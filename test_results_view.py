@@ -0,0 +1,41 @@
+from ad import Ad
+from result_store import ResultStore
+from results_view import ResultsModel
+
+
+def make_ad(ad_id, title, km):
+    return Ad(str(ad_id), title, "10 €", f"/s-anzeige/{ad_id}", f"10115 Berlin ({km} km)", None)
+
+
+def test_filter_narrows_and_widens():
+    store = ResultStore()
+    for i, title in enumerate(["Fahrrad Herren", "Kinderfahrrad", "Fahrradständer", "Sofa"]):
+        store.add(make_ad(i, title, 10 - i))
+    model = ResultsModel(store)
+    assert model.refresh()
+    assert [ad.title for ad in model.window(0, 10)] == ["Sofa", "Fahrradständer", "Kinderfahrrad", "Fahrrad Herren"]
+
+    assert model.set_filter("fahr")
+    assert len(model) == 3
+    assert model.set_filter("FAHRRADSTÄ")  # normalized like the titles
+    assert [ad.title for ad in model.window(0, 10)] == ["Fahrradständer"]
+    assert model.set_filter("")
+    assert len(model) == 4
+    assert not model.set_filter("  ")
+
+
+def test_new_results_and_windowing():
+    store = ResultStore()
+    model = ResultsModel(store)
+    for i in range(100):
+        store.add(make_ad(i, f"Lampe {i}", i + 1))
+    model.set_filter("lampe")
+    assert model.refresh()
+    assert not model.refresh()
+    assert [ad.id for ad in model.window(10, 3)] == ["10", "11", "12"]
+    assert model.clamp(95, 20) == 80
+
+    store.add(make_ad(500, "Lampe neu", 0))
+    assert model.refresh()
+    assert len(model) == 101
+    assert model.window(0, 1)[0].id == "500"
@@ -0,0 +1,59 @@
+from scheduler import AdaptiveScheduler
+
+
+def test_busy_searches_are_polled_more_often():
+    scheduler = AdaptiveScheduler(min_interval=60, max_interval=3600, default_interval=300,
+                                  requests_per_minute=1000)
+    scheduler.sync(["busy", "quiet"], now=0)
+    assert sorted(scheduler.pop_due(10, now=0)) == ["busy", "quiet"]
+    scheduler.record("busy", None, now=0)
+    scheduler.record("quiet", None, now=0)
+
+    # 100 new ads per hour vs. none at all
+    for now in range(3600, 36001, 3600):
+        scheduler.record("busy", 100, now=now)
+        scheduler.record("quiet", 0, now=now)
+
+    intervals = scheduler.intervals()
+    assert intervals["busy"][0] == 60
+    assert intervals["quiet"][0] > 1000
+
+
+def test_request_budget_limits_due_searches():
+    scheduler = AdaptiveScheduler(requests_per_minute=2)
+    scheduler.sync(["a", "b", "c"], now=0)
+    assert len(scheduler.pop_due(10, now=0)) == 2
+    assert scheduler.pop_due(10, now=1) == []
+    assert 0 < scheduler.seconds_until_due(now=1) <= 30
+    assert len(scheduler.pop_due(10, now=31)) == 1
+
+
+def test_removed_searches_are_forgotten():
+    scheduler = AdaptiveScheduler()
+    scheduler.sync(["a", "b"], now=0)
+    scheduler.sync(["b"], now=0)
+    assert scheduler.pop_due(10, now=0) == ["b"]
+    assert scheduler.seconds_until_due(now=0) is None
+
+
+def test_joined_groups_are_due_once():
+    scheduler = AdaptiveScheduler(default_interval=300, requests_per_minute=1000)
+    scheduler.sync(["a", "b"], now=0)
+    scheduler.pop_due(10, now=0)
+    scheduler.record("a", None, now=0)
+    scheduler.record("b", None, now=0)
+
+    # A new search joined "a": it is polled now instead of in 300 s
+    scheduler.sync(["a", "b"], now=10, due={"a"})
+    assert scheduler.pop_due(10, now=10) == ["a"]
+
+    # A failed poll waits for its interval, even though the search is still new
+    scheduler.release("a", now=11)
+    scheduler.sync(["a", "b"], now=12, due={"a"})
+    assert scheduler.pop_due(10, now=12) == []
+    assert scheduler.pop_due(10, now=311) == ["b", "a"]
+
+    # After the next recorded poll the group can be pulled forward again
+    scheduler.record("a", 0, now=311)
+    scheduler.sync(["a", "b"], now=320, due={"a"})
+    assert scheduler.pop_due(10, now=320) == ["a"]
@@ -1,10 +1,14 @@
-from scraper import KleinanzeigenScraper
+from scraper import KleinanzeigenScraper, ScrapeError
 
 def test_scraper():
     scraper = KleinanzeigenScraper()
     print("Testing scraper...")
     # Use a very common term to ensure results
-    results = scraper.search("iphone", "Berlin")
+    try:
+        results = scraper.search("iphone", "Berlin")
+    except ScrapeError as e:
+        print(f"Scraping failed: {e}")
+        return
     
     if results:
         print(f"Success! Found {len(results)} ads.")
@@ -0,0 +1,62 @@
+from collections import deque
+
+import fixtures
+from planner import plan_cycle
+from scraper import ResultList
+
+
+def test_first_run_seeds_without_detail_requests(mgr, monkeypatch):
+    page = ResultList(mgr.scraper.parse_results(fixtures.make_results_page(10)))
+    monkeypatch.setattr(mgr.scraper, "search_pages", lambda *args, **kwargs: iter([page]))
+    details = []
+    monkeypatch.setattr(mgr.scraper, "get_ad_details", lambda url: details.append(url) or "nichts")
+    notified = []
+    mgr.notify_new_ad = lambda ad, search="": notified.append(ad)
+
+    # The query is not in the titles, only the description could decide
+    mgr.add_search("zzz", "", 0, filter_keywords=["pro"])
+    search = mgr.searches[0]
+    mgr.running = True
+    mgr.compile_matcher(mgr.searches)
+    (group,) = plan_cycle(mgr.searches)
+
+    assert mgr._process_group(group) == (None, 1)
+    assert details == []
+    assert not search['first_run']
+    assert len(search['pending']) == len(mgr.deferred) == 10
+
+    mgr._evaluate_deferred(100)
+    assert len(details) == 10
+    assert search['pending'] == [] and not mgr.deferred
+
+    # Regular passes reuse the background verdicts
+    mgr._process_group(group)
+    assert len(details) == 10
+    assert notified == []
+
+
+def test_full_background_queue_keeps_ids_pending(mgr, monkeypatch, caplog):
+    page = ResultList(mgr.scraper.parse_results(fixtures.make_results_page(10)))
+    monkeypatch.setattr(mgr.scraper, "search_pages", lambda *args, **kwargs: iter([page]))
+    monkeypatch.setattr(mgr.scraper, "get_ad_details", lambda url: "zzz pro")
+    notified = []
+    mgr.notify_new_ad = lambda ad, search="": notified.append(ad)
+    mgr.deferred = deque(maxlen=4)
+    mgr.add_search("zzz", "", 0, filter_keywords=["pro"])
+    search = mgr.searches[0]
+    mgr.running = True
+    mgr.compile_matcher(mgr.searches)
+    (group,) = plan_cycle(mgr.searches)
+
+    mgr._process_group(group)
+    assert [ad.id for _, _, ad in mgr.deferred] == [ad.id for ad in page[6:]]
+    assert search['pending'] == [ad.id for ad in page]
+    assert "6 ads are left to regular passes" in caplog.text
+
+    # A full pass (e.g. after a restart) decides the dropped ads, all match but none notifies
+    mgr.deferred.clear()
+    mgr.fingerprints = {}
+    mgr.compile_matcher(mgr.searches)
+    mgr._process_group(group)
+    assert len(mgr.found_ads) == 10
+    assert notified == [] and search['pending'] == []
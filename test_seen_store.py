@@ -0,0 +1,38 @@
+import seen_store
+from seen_store import SeenAdsStore
+
+
+def test_add_is_persisted(tmp_path):
+    path = str(tmp_path / "seen.db")
+    store = SeenAdsStore(path)
+    assert store.add("3252456670")
+    assert not store.add("3252456670")
+    assert "3252456670" in store
+    store.close()
+
+    # Reopening without any explicit save keeps the id
+    store = SeenAdsStore(path)
+    assert "3252456670" in store
+    assert len(store) == 1
+
+
+def test_second_store_sees_claim(tmp_path):
+    path = str(tmp_path / "seen.db")
+    a = SeenAdsStore(path)
+    b = SeenAdsStore(path)
+    assert a.add(42)
+    assert not b.add(42)
+
+
+def test_evict_unlisted(tmp_path, monkeypatch):
+    store = SeenAdsStore(str(tmp_path / "seen.db"), max_age_days=7)
+    store.update(["1", "2", "3"])
+
+    day = seen_store._today()
+    monkeypatch.setattr(seen_store, "_today", lambda: day + 5)
+    store.touch(["1"])
+    monkeypatch.setattr(seen_store, "_today", lambda: day + 10)
+
+    assert store.evict() == 2
+    assert "1" in store
+    assert "2" not in store
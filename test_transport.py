@@ -0,0 +1,40 @@
+import pytest
+
+from governor import ScrapeError
+from scraper import KleinanzeigenScraper
+from standin_server import PAGE_SIZE, StandinServer, World
+
+
+def test_world_adds_new_ads_on_top():
+    now = [0.0]
+    world = World(churn=2.0, pages=1, clock=lambda: now[0])
+    first = world.ids(("fahrrad", "", ""))
+    assert len(first) == PAGE_SIZE and first == sorted(first, reverse=True)
+
+    now[0] = 90.0  # 1.5 minutes: 3 new ads
+    second = world.ids(("fahrrad", "", ""))
+    assert second[3:] == first and min(second[:3]) > max(first)
+    assert world.created[second[0]] == 90.0 and world.created[first[0]] is None
+    assert world.ids(("sofa", "", ""))[0] > second[0]
+
+
+def test_record_then_replay(tmp_path):
+    server = StandinServer(World(churn=0))
+    server.start()
+    recorder = KleinanzeigenScraper((0, 0), warm_up=False, base_url=server.url, transport="record",
+                                    cassette_dir=str(tmp_path))
+    recorded = recorder.search("fahrrad", "Berlin")
+    description = recorder.get_ad_details(recorded[0].link)
+    server.shutdown()
+    server.server_close()
+    assert len(recorded) == PAGE_SIZE and description
+    assert server.requests == {'search': 1, 'detail': 1}
+
+    # Same requests against another host, answered from the cassettes only
+    player = KleinanzeigenScraper((0, 0), warm_up=False, base_url="http://127.0.0.1:9", transport="replay",
+                                  cassette_dir=str(tmp_path))
+    replayed = player.search("fahrrad", "Berlin")
+    assert [ad.id for ad in replayed] == [ad.id for ad in recorded]
+    assert player.get_ad_details(recorded[0].link.replace(server.url, player.base_url)) == description
+    with pytest.raises(ScrapeError):
+        player.search("sofa", "Berlin")
@@ -0,0 +1,44 @@
+from verdicts import VerdictCache, definition_hash
+
+KEY = ("iphone", "Berlin", "0", "0")
+RULE = ("iphone", ("pro",))
+
+
+def test_definition_hash_follows_the_definition():
+    base = definition_hash(KEY, RULE)
+    assert base == definition_hash(KEY, ("iphone", ("pro",)))
+    assert base != definition_hash(KEY, ("iphone", ("max",)))
+    assert base != definition_hash(("iphone", "Hamburg", "0", "0"), RULE)
+    assert base != definition_hash(KEY, RULE, whole_words=True)
+
+
+def test_verdicts_expire_when_the_ad_leaves_the_list():
+    cache = VerdictCache(keep_passes=2)
+    definition = definition_hash(KEY, RULE)
+    cache.put_many(definition, {"1": True, "2": False, "3": None})
+    cache.seen(definition, ["1", "2"])
+    assert cache.get_many(definition, ["1", "2", "3"]) == {"1": True, "2": False}
+
+    # "2" is gone from the list
+    for _ in range(3):
+        cache.seen(definition, ["1"])
+    assert cache.get_many(definition, ["1", "2"]) == {"1": True}
+
+    cache.retain(set())
+    assert len(cache) == 0
+
+
+def test_edit_search_starts_over(mgr):
+    mgr.add_search("iphone", "Berlin", 0, filter_keywords=["pro"])
+    mgr.add_search("ipad", "Berlin", 0)
+    search = mgr.searches[0]
+    search.update(first_run=False, watermark=100, rate=0.01)
+
+    mgr.edit_search(0, "iphone", "Berlin", 0, filter_keywords=["pro"], notifications=False)
+    assert mgr.searches[0] is search
+    assert (search['watermark'], search['first_run'], search['notifications']) == (100, False, False)
+
+    mgr.edit_search(0, "iphone", "Berlin", 0, filter_keywords=["max"])
+    assert mgr.searches[0] is search
+    assert 'watermark' not in search and search['first_run']
+    assert [s['query'] for s in mgr.searches] == ["iphone", "ipad"]
@@ -0,0 +1,125 @@
+"""
+Pluggable transport for the scraper's requests session.
+
+    live    requests go to the network
+    record  like live, every answer is also written to the cassette directory
+    replay  answers come from the cassette directory, the network is never used
+
+A cassette entry is the decoded body (<key>.html, readable like
+debug_last_response.html) plus its status and content type (<key>.json).
+The key is the method, path and sorted query of the URL without the host,
+so pages recorded against the stand-in server replay under any base_url.
+Blocked and failed answers (429, 403, 5xx) are transient and not recorded.
+
+Only imported once the session is created, it needs requests.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+MODES = ("live", "record", "replay")
+
+# Not worth replaying, the next run should ask again
+TRANSIENT_STATUS = (403, 429)
+
+
+class Cassette:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(method, url):
+        parts = urllib.parse.urlsplit(url)
+        query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+        return hashlib.blake2b(f"{method} {parts.path}?{query}".encode('utf-8'), digest_size=16).hexdigest()
+
+    def _paths(self, method, url):
+        base = os.path.join(self.directory, self.key(method, url))
+        return base + ".json", base + ".html"
+
+    def save(self, method, url, status, content_type, body):
+        meta_path, body_path = self._paths(method, url)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(body_path, 'wb') as f:
+                f.write(body)
+            # Written last, an entry without it does not exist
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'method': method, 'url': url, 'status': status, 'content_type': content_type}, f)
+
+    def load(self, method, url):
+        """(meta, body) of the recorded answer, None if there is none."""
+        meta_path, body_path = self._paths(method, url)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                return meta, f.read()
+        except FileNotFoundError:
+            return None
+
+    def __len__(self):
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+
+
+def _replay(adapter, request, meta, body):
+    """A streamable requests.Response for a cassette entry."""
+    headers = {'Content-Length': str(len(body))}
+    if meta.get('content_type'):
+        headers['Content-Type'] = meta['content_type']
+    raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=meta['status'],
+                       preload_content=False, decode_content=False)
+    return adapter.build_response(request, raw)
+
+
+class RecordingAdapter(HTTPAdapter):
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        status = response.status_code
+        if status in TRANSIENT_STATUS or status >= 500:
+            return response
+        # The whole body is needed for the cassette, early termination does not apply
+        body = response.content
+        meta = {'status': status, 'content_type': response.headers.get('Content-Type')}
+        self.cassette.save(request.method, request.url, status, meta['content_type'], body)
+        return _replay(self, request, meta, body)
+
+
+class ReplayAdapter(HTTPAdapter):
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        entry = self.cassette.load(request.method, request.url)
+        if entry is None:
+            raise requests.ConnectionError(f"No recording for {request.method} {request.url}", request=request)
+        return _replay(self, request, *entry)
+
+
+def make_adapter(mode, cassette_dir, **kwargs):
+    """The adapter to mount on the session, kwargs go to HTTPAdapter (pool sizes)."""
+    if mode == "live":
+        return HTTPAdapter(**kwargs)
+    if mode == "record":
+        return RecordingAdapter(Cassette(cassette_dir), **kwargs)
+    if mode == "replay":
+        return ReplayAdapter(Cassette(cassette_dir), **kwargs)
+    raise ValueError(f"Unknown transport '{mode}', expected one of {MODES}")
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import threading
+
+
+def definition_hash(key, rule, whole_words=False):
+    """
+    Identifies what a verdict depends on: the result list (key), the
+    normalized query and filters (rule) and the matching mode.
+    """
+    data = json.dumps([list(key), rule[0], list(rule[1]), bool(whole_words)], ensure_ascii=False)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=12).hexdigest()
+
+
+class VerdictCache:
+    """
+    Remembers match and no-match per (search definition, ad id), so an ad
+    that stays on a result list is evaluated (and its description fetched)
+    once instead of on every pass.
+
+    Every pass over a definition's result list stamps the ids it saw,
+    entries that were missing from the last keep_passes passes belong to ads
+    that left the list and are dropped. Definitions that no search uses any
+    more, e.g. after an edit, are dropped by retain().
+    """
+
+    def __init__(self, keep_passes=3):
+        self.keep_passes = keep_passes
+        self._entries = {}  # definition -> {ad id: [verdict, pass]}
+        self._passes = {}   # definition -> number of passes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, definition, ad_ids):
+        """Known verdicts for ad_ids as a dict, unknown ids are left out."""
+        with self._lock:
+            entries = self._entries.get(definition, {})
+            known = {ad_id: entries[ad_id][0] for ad_id in ad_ids if ad_id in entries}
+            self.hits += len(known)
+            self.misses += len(ad_ids) - len(known)
+            return known
+
+    def put_many(self, definition, verdicts):
+        """Stores decided verdicts (True/False), undecided ones (None) are skipped."""
+        with self._lock:
+            entries = self._entries.setdefault(definition, {})
+            stamp = self._passes.get(definition, 0)
+            for ad_id, verdict in verdicts.items():
+                if verdict is not None:
+                    entries[ad_id] = [verdict, stamp]
+
+    def seen(self, definition, ad_ids):
+        """Ends a pass: ad_ids are still listed, returns how many entries expired."""
+        with self._lock:
+            stamp = self._passes[definition] = self._passes.get(definition, 0) + 1
+            entries = self._entries.get(definition)
+            if not entries:
+                return 0
+            for ad_id in ad_ids:
+                entry = entries.get(ad_id)
+                if entry is not None:
+                    entry[1] = stamp
+            expired = [ad_id for ad_id, entry in entries.items() if entry[1] < stamp - self.keep_passes]
+            for ad_id in expired:
+                del entries[ad_id]
+            return len(expired)
+
+    def retain(self, definitions):
+        """Drops everything that belongs to other definitions."""
+        with self._lock:
+            for definition in set(self._entries) | set(self._passes):
+                if definition not in definitions:
+                    self._entries.pop(definition, None)
+                    self._passes.pop(definition, None)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())